@@ -0,0 +1,227 @@
+import os
+import re
+import time
+import argparse
+import threading
+
+import numpy as np
+import torch
+from sklearn.preprocessing import MinMaxScaler
+
+from model import CTTS
+from atomic import atomic_write
+
+ARTIFACT_FORMAT = "ctts"
+ARTIFACT_VERSION = 2
+SHARED_MODEL = "model_shared.pth"
+DEFAULT_NUM_HEADS = 4  # not recoverable from a bare state_dict
+
+# An artifact is a torch.save'd dict of tensors, strings and numbers, so it
+# loads with weights_only=True and mmap=True:
+#   format, version     "ctts", ARTIFACT_VERSION
+#   state_dict          CTTS weights
+#   hparams             CTTS constructor arguments
+#   features            ordered input columns
+#   seq_length          window length used in training
+#   scaler              MinMaxScaler min_/scale_/data_min_/data_max_ as float64 tensors, or None
+#   scalers             shared models (v2): {ticker: scaler}; ticker ids follow this order
+#   training            training hyperparameters and data size
+#   ticker, created
+
+
+shared_tickers_cache = {}  # {path: (mtime, tickers)}
+shared_tickers_lock = threading.Lock()
+
+
+def shared_tickers(path):
+    mtime = os.stat(path).st_mtime_ns
+    with shared_tickers_lock:
+        cached = shared_tickers_cache.get(path)
+        if cached is None or cached[0] != mtime:
+            cached = shared_tickers_cache[path] = (mtime, set(load_artifact(path).tickers or ()))
+        return cached[1]
+
+
+def checkpoint_path(ticker, model_dir="models"):
+    # The shared multi-ticker model when it covers the ticker, then a
+    # per-ticker model when one was trained, then the generic model.pth
+    shared = os.path.join(model_dir, SHARED_MODEL)
+    if os.path.exists(shared) and ticker in shared_tickers(shared):
+        return shared
+    path = os.path.join(model_dir, f"model_{ticker}.pth")
+    if os.path.exists(path):
+        return path
+    return os.path.join(model_dir, "model.pth")
+
+
+def model_hparams(model):
+    return {
+        "input_dim": model.conv1.in_channels,
+        "cnn_channels": model.conv1.out_channels,
+        "num_heads": model.transformer.layers[0].self_attn.num_heads,
+        "transformer_layers": len(model.transformer.layers),
+        "hidden_dim": model.fc1.out_features,
+        "output_dim": model.fc2.out_features,
+        "attention": model.attention,
+        "window": model.window,
+        "token_stride": model.token_stride,
+        "num_tickers": model.num_tickers,
+    }
+
+
+def hparams_from_state(state_dict):
+    layers = {int(m.group(1)) for key in state_dict for m in [re.match(r"transformer\.layers\.(\d+)\.", key)] if m}
+    return {
+        "input_dim": state_dict["conv1.weight"].shape[1],
+        "cnn_channels": state_dict["conv1.weight"].shape[0],
+        "num_heads": DEFAULT_NUM_HEADS,
+        "transformer_layers": len(layers),
+        "hidden_dim": state_dict["fc1.weight"].shape[0],
+        "output_dim": state_dict["fc2.weight"].shape[0],
+    }
+
+
+def scaler_state(scaler):
+    return {
+        "feature_range": list(scaler.feature_range),
+        "n_samples_seen": int(scaler.n_samples_seen_),
+        **{name: torch.from_numpy(np.asarray(getattr(scaler, name + "_"), dtype=np.float64))
+           for name in ("min", "scale", "data_min", "data_max")},
+    }
+
+
+def scaler_from_state(state):
+    """
+    Rebuild the fitted MinMaxScaler exactly, without refitting on any data.
+    """
+    scaler = MinMaxScaler(feature_range=tuple(state["feature_range"]))
+    for name in ("min", "scale", "data_min", "data_max"):
+        setattr(scaler, name + "_", state[name].numpy())
+    scaler.data_range_ = scaler.data_max_ - scaler.data_min_
+    scaler.n_features_in_ = len(scaler.min_)
+    scaler.n_samples_seen_ = state["n_samples_seen"]
+    return scaler
+
+
+class ModelArtifact:
+    """
+    A loaded checkpoint. Bare state_dict files from older training runs load
+    too, with `scaler`, `features` and `seq_length` left as None.
+
+    Shared models carry one scaler per ticker in `scalers`, and `tickers`
+    gives the embedding id of each.
+    """
+
+    def __init__(self, state_dict, hparams, scaler=None, features=None, seq_length=None, training=None,
+                 ticker=None, version=None, scalers=None):
+        self.state_dict = state_dict
+        self.hparams = hparams
+        self.scaler = scaler
+        self.scalers = scalers
+        self.tickers = list(scalers) if scalers else None
+        self.features = features
+        self.seq_length = seq_length
+        self.training = training or {}
+        self.ticker = ticker
+        self.version = version
+
+    @property
+    def input_dim(self):
+        return self.hparams["input_dim"]
+
+    @property
+    def horizon(self):
+        # Steps predicted per forward pass
+        return self.hparams["output_dim"]
+
+    def ticker_id(self, ticker):
+        """
+        Embedding id for shared models, None for single-ticker ones.
+        """
+        if self.tickers is None:
+            return None
+        if ticker not in self.tickers:
+            raise ValueError(f"{ticker} is not one of the {len(self.tickers)} tickers in this shared model")
+        return self.tickers.index(ticker)
+
+    def scaler_for(self, ticker):
+        return self.scalers[ticker] if self.scalers else self.scaler
+
+    def build_model(self, device="cpu"):
+        model = CTTS(**self.hparams)
+        # assign=True keeps the memory-mapped tensors instead of copying them
+        model.load_state_dict(self.state_dict, assign=True)
+        return model.to(device).eval()
+
+
+def save_artifact(path, model, scaler, features, seq_length, training=None, ticker=None, scalers=None):
+    artifact = {
+        "format": ARTIFACT_FORMAT,
+        "version": ARTIFACT_VERSION,
+        "state_dict": {key: value.detach().cpu() for key, value in model.state_dict().items()},
+        "hparams": model_hparams(model),
+        "features": list(features) if features is not None else None,
+        "seq_length": int(seq_length) if seq_length is not None else None,
+        "scaler": scaler_state(scaler) if scaler is not None else None,
+        "scalers": {name: scaler_state(value) for name, value in scalers.items()} if scalers else None,
+        "training": training or {},
+        "ticker": ticker,
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+    }
+    with atomic_write(path) as tmp_path:
+        torch.save(artifact, tmp_path)
+    return path
+
+
+def load_artifact(path):
+    """
+    Memory-map a checkpoint; cost is O(model size), independent of the dataset.
+    """
+    checkpoint = torch.load(path, map_location="cpu", mmap=True, weights_only=True)
+    if checkpoint.get("format") != ARTIFACT_FORMAT:
+        return ModelArtifact(checkpoint, hparams_from_state(checkpoint))
+
+    if checkpoint["version"] > ARTIFACT_VERSION:
+        raise ValueError(f"{path} is artifact version {checkpoint['version']}; this code reads up to {ARTIFACT_VERSION}")
+    return ModelArtifact(
+        checkpoint["state_dict"],
+        checkpoint["hparams"],
+        scaler=scaler_from_state(checkpoint["scaler"]) if checkpoint["scaler"] is not None else None,
+        features=checkpoint["features"],
+        seq_length=checkpoint["seq_length"],
+        training=checkpoint["training"],
+        ticker=checkpoint["ticker"],
+        version=checkpoint["version"],
+        scalers={name: scaler_from_state(state) for name, state in (checkpoint.get("scalers") or {}).items()},
+    )
+
+
+def convert_checkpoint(path, out_path=None, seq_length=None, **hparams):
+    """
+    Rewrite a checkpoint (artifact or bare state_dict) as an artifact with
+    updated CTTS hyperparameters, e.g. attention="local", window=128, and
+    optionally a new default window length. The weights are shared by all
+    attention modes, so they carry over unchanged.
+    """
+    artifact = load_artifact(path)
+    model = CTTS(**dict(artifact.hparams, **hparams))
+    model.load_state_dict(artifact.state_dict)
+    return save_artifact(out_path or path, model, artifact.scaler, artifact.features, seq_length or artifact.seq_length,
+                         artifact.training, artifact.ticker, artifact.scalers)
+
+
+if __name__ == "__main__":
+    # python artifacts.py models/model.pth --attention local --window 128 --seq-length 2000
+    parser = argparse.ArgumentParser(description="Convert a CTTS checkpoint to the current artifact format.")
+    parser.add_argument("path")
+    parser.add_argument("--out", help="Write here instead of overwriting `path`")
+    parser.add_argument("--attention", choices=["full", "local"])
+    parser.add_argument("--window", type=int)
+    parser.add_argument("--token-stride", type=int)
+    parser.add_argument("--seq-length", type=int, help="Default window length for predictions")
+    args = parser.parse_args()
+
+    hparams = {"attention": args.attention, "window": args.window, "token_stride": args.token_stride}
+    hparams = {key: value for key, value in hparams.items() if value is not None}
+    out_path = convert_checkpoint(args.path, args.out, args.seq_length, **hparams)
+    print(f"Converted {args.path} -> {out_path}")
@@ -0,0 +1,33 @@
+import os
+import tempfile
+import contextlib
+
+# Read once at import, while nothing else is running: os.umask can only be read by setting it
+UMASK = os.umask(0)
+os.umask(UMASK)
+
+
+@contextlib.contextmanager
+def atomic_write(path):
+    """
+    Yield a temp path beside `path` to write to; when the block succeeds it
+    is renamed over `path`, otherwise removed.
+
+    Readers see the old file or the new one, never half of either: loaders
+    (registry, torch.jit.load, onnxruntime, memory maps) keep the old file
+    until they reopen. Every writer gets its own temp file from mkstemp, so
+    threads and pre-forked workers writing the same path don't trample each
+    other; the last rename wins.
+    """
+    path = os.path.abspath(path)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=os.path.basename(path) + ".", suffix=".tmp")
+    os.close(fd)
+    # mkstemp creates the file 0600; give it the mode a plain open() would
+    os.chmod(tmp_path, 0o666 & ~UMASK)
+    try:
+        yield tmp_path
+        os.replace(tmp_path, path)
+    except BaseException:
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(tmp_path)
+        raise
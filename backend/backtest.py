@@ -0,0 +1,189 @@
+import numpy as np
+
+
+def lookahead_windows(n_days, n_predicted, lookahead):
+    """
+    Bounds of predicted[day + 1: day + 1 + lookahead] for every trading day.
+    """
+    days = np.arange(n_days - 1)
+    start = np.minimum(days + 1, n_predicted)
+    end = np.minimum(days + 1 + lookahead, n_predicted)
+    return start, end
+
+
+def lookahead_means(actual, predicted, lookahead):
+    """
+    Mean of the next `lookahead` predictions for every day but the last, or the
+    current price where no predictions are left. Uses cumulative sums, so the
+    whole series costs O(days) instead of O(days x lookahead).
+    """
+    actual = np.asarray(actual, dtype=np.float64)
+    predicted = np.asarray(predicted, dtype=np.float64)
+    start, end = lookahead_windows(len(actual), len(predicted), lookahead)
+
+    sums = np.concatenate(([0.0], np.cumsum(predicted)))
+    count = end - start
+    with np.errstate(invalid="ignore", divide="ignore"):
+        means = (sums[end] - sums[start]) / count
+    return np.where(count > 0, means, actual[:-1])
+
+
+def generate_signals(actual, predicted, lookahead, threshold):
+    """
+    Entry and exit signals for one stock as boolean arrays over days 0..n-2.
+
+    Returns (enter_long, enter_short, exit_long, exit_short). Means that land
+    within rounding distance of a threshold are recomputed with a sequential
+    sum, so decisions match the per-day Python loop exactly.
+    """
+    prices = np.asarray(actual, dtype=np.float64)[:-1]
+    means = lookahead_means(actual, predicted, lookahead)
+
+    bounds = (prices * (1 + threshold), prices * (1 - threshold), prices)
+    near = np.zeros(len(prices), dtype=bool)
+    for bound in bounds:
+        near |= np.isclose(means, bound, rtol=1e-9, atol=0.0)
+    if near.any():
+        start, end = lookahead_windows(len(actual), len(predicted), lookahead)
+        predicted = list(predicted)
+        for day in np.flatnonzero(near & (end > start)).tolist():
+            future_prices = predicted[start[day]:end[day]]
+            means[day] = sum(future_prices) / len(future_prices)
+
+    enter_long = means > bounds[0]
+    enter_short = ~enter_long & (means < bounds[1])
+    exit_long = means < prices
+    exit_short = means > prices
+    return enter_long, enter_short, exit_long, exit_short
+
+
+def run_backtest(stock_data, initial_balance=10000, lookahead=5, threshold=0.02):
+    """
+    Shared engine behind the try_run trading simulations.
+
+    Signals are precomputed as (stocks x days) arrays. Each day a vectorized
+    mask picks the stocks that can change state (an affordable entry signal
+    while flat, an exit signal while holding); only those run through the
+    cash/position accounting, in stock order as a per-day loop would. HOLD
+    rows are filled in afterwards with the balance in effect at that point.
+
+    Returns (balance, events, final_events), where events are
+    (day, stock, action, price, balance) tuples in log order with action one of
+    BUY, SHORT, EXIT_LONG, EXIT_SHORT or HOLD, and final_events are
+    (stock, position_type, price, balance) for the last-day liquidation.
+    """
+    balance = initial_balance
+    positions = {}  # {stock: {"type": "long"/"short", "shares": int, "entry_price": float}}
+
+    stocks = list(stock_data)
+    n_stocks = len(stocks)
+    n_days = len(next(iter(stock_data.values()))[0])
+
+    prices = [np.asarray(stock_data[stock][0], dtype=np.float64)[:n_days].tolist() for stock in stocks]
+    signals = [generate_signals(stock_data[stock][0][:n_days], stock_data[stock][1], lookahead, threshold) for stock in stocks]
+    price_matrix = np.array([row[:-1] for row in prices]).reshape(n_stocks, -1)
+    enter_long, enter_short, exit_long, exit_short = (np.array([s[k] for s in signals]).reshape(n_stocks, -1) for k in range(4))
+    enter_any = enter_long | enter_short
+
+    is_long = np.zeros(n_stocks, dtype=bool)
+    is_short = np.zeros(n_stocks, dtype=bool)
+    opened_on = [None] * n_stocks
+
+    keys, actions, balances = [], [], []  # state changes, keyed by day * n_stocks + stock index
+    holding = []  # (stock index, first HOLD day, last HOLD day + 1)
+
+    def candidates(day, after):
+        # Prefilter on shares > 0; the tolerance only widens it and non-positive
+        # prices always go through, since the exact check happens below
+        day_prices = price_matrix[:, day]
+        affordable = day_prices <= 0
+        if balance > 0:
+            affordable |= day_prices <= balance * (1 + 1e-9)
+        mask = (is_long & exit_long[:, day]) | (is_short & exit_short[:, day])
+        mask |= ~(is_long | is_short) & enter_any[:, day] & affordable
+        found = np.flatnonzero(mask)
+        return found[found > after].tolist()
+
+    for day in range(n_days - 1):
+        pending = candidates(day, -1)
+        while pending:
+            i = pending.pop(0)
+            stock = stocks[i]
+            current_price = prices[i][day]
+
+            if is_long[i]:
+                balance += positions[stock]["shares"] * current_price
+                action = "EXIT_LONG"
+            elif is_short[i]:
+                position = positions[stock]
+                balance += position["shares"] * (position["entry_price"] - current_price)
+                action = "EXIT_SHORT"
+            else:
+                shares = int(balance // current_price)
+                if shares <= 0:
+                    continue
+                if enter_long[i, day]:
+                    balance -= shares * current_price
+                    positions[stock] = {"type": "long", "shares": shares, "entry_price": current_price}
+                    is_long[i] = True
+                    action = "BUY"
+                else:
+                    balance += shares * current_price
+                    positions[stock] = {"type": "short", "shares": shares, "entry_price": current_price}
+                    is_short[i] = True
+                    action = "SHORT"
+                opened_on[i] = day
+
+            if action.startswith("EXIT"):
+                positions.pop(stock)
+                holding.append((i, opened_on[i] + 1, day))
+                is_long[i] = is_short[i] = False
+
+            keys.append(day * n_stocks + i)
+            actions.append(action)
+            balances.append(balance)
+
+            # The balance moved, so later stocks may have become (un)affordable today
+            pending = candidates(day, i)
+
+    for i in range(n_stocks):
+        if is_long[i] or is_short[i]:
+            holding.append((i, opened_on[i] + 1, n_days - 1))
+
+    # HOLD rows take the balance after the latest state change that precedes them
+    spans = [(i, start, end) for i, start, end in holding if end > start]
+    hold_stocks = np.concatenate([np.full(end - start, i) for i, start, end in spans] or [np.empty(0, dtype=np.int64)])
+    hold_days = np.concatenate([np.arange(start, end) for i, start, end in spans] or [np.empty(0, dtype=np.int64)])
+    change_keys = np.asarray(keys, dtype=np.int64)
+    hold_keys = hold_days * n_stocks + hold_stocks
+    latest = np.searchsorted(change_keys, hold_keys, side="right")
+
+    # Assemble the log column-wise, then put it in (day, stock) order
+    n_changes = len(keys)
+    all_keys = np.concatenate((change_keys, hold_keys))
+    order = np.argsort(all_keys, kind="stable")
+    days, indices = np.divmod(all_keys[order], n_stocks)
+    label_index = np.concatenate((np.arange(n_changes), np.full(len(hold_keys), n_changes)))[order]
+    balance_index = np.concatenate((np.arange(1, n_changes + 1), latest))[order]
+    labels = np.array(actions + ["HOLD"], dtype=object)[label_index]
+    balance_column = np.array([initial_balance] + balances, dtype=np.float64)[balance_index]
+    full_prices = np.array(prices).reshape(n_stocks, -1)
+    events = list(zip(
+        days.tolist(),
+        np.array(stocks, dtype=object)[indices].tolist(),
+        labels.tolist(),
+        full_prices[indices, days].tolist(),
+        balance_column.tolist(),
+    ))
+
+    # Final day liquidation, in the order positions were opened
+    final_events = []
+    for stock, pos in positions.items():
+        final_price = stock_data[stock][0][-1]
+        if pos["type"] == "long":
+            balance += pos["shares"] * final_price
+        elif pos["type"] == "short":
+            balance += pos["shares"] * (pos["entry_price"] - final_price)
+        final_events.append((stock, pos["type"], final_price, balance))
+
+    return balance, events, final_events
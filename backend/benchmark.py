@@ -0,0 +1,423 @@
+import os
+import sys
+import json
+import time
+import platform
+import resource
+import argparse
+import contextlib
+import tempfile
+import threading
+import subprocess
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+import torch
+
+os.environ.setdefault("EXPLANATION_BACKEND", "stub")  # never call the LLM from a benchmark
+
+RESULTS_DIR = "benchmarks"
+SEED = 1234
+TICKERS = ["BENCH_A", "BENCH_B", "BENCH_C"]
+REGRESSION_THRESHOLD = 0.10  # flag p50 slowdowns above 10%
+
+# Each case runs in a scratch workspace (data/ and models/ under a temp dir)
+# filled with synthetic OHLCV data, feature stores and a randomly initialised
+# CTTS artifact, so results depend on the code and the machine only.
+
+
+def synthetic_ohlcv(n_rows, seed=SEED):
+    rng = np.random.default_rng(seed)
+    close = 1000 * np.exp(np.cumsum(rng.normal(0, 0.01, n_rows)))
+    open_ = close * (1 + rng.normal(0, 0.002, n_rows))
+    high = np.maximum(open_, close) * (1 + np.abs(rng.normal(0, 0.003, n_rows)))
+    low = np.minimum(open_, close) * (1 - np.abs(rng.normal(0, 0.003, n_rows)))
+    return pd.DataFrame({
+        "Date": pd.date_range("2020-01-01", periods=n_rows, freq="min"),
+        "Close": close,
+        "High": high,
+        "Low": low,
+        "Open": open_,
+        "Volume": rng.integers(1_000, 100_000, n_rows).astype(float),
+    })
+
+
+def synthetic_features(df):
+    """
+    The training feature layout (OHLCV + indicators), computed with the
+    incremental engine so no pandas-ta is needed; warm-up rows backfilled.
+    """
+    from indicators import IncrementalIndicators, INDICATOR_COLUMNS
+
+    engine = IncrementalIndicators()
+    indicators = pd.DataFrame([engine.update_close(close) for close in df["Close"]], columns=INDICATOR_COLUMNS)
+    return pd.concat([df.reset_index(drop=True), indicators], axis=1).bfill()
+
+
+def build_workspace(n_rows, seq_length):
+    from feature_store import write_store
+    from artifacts import save_artifact
+    from model import CTTS
+    from sklearn.preprocessing import MinMaxScaler
+
+    os.makedirs("models", exist_ok=True)
+    for i, ticker in enumerate(TICKERS):
+        df = synthetic_features(synthetic_ohlcv(n_rows, SEED + i))
+        write_store(df, ticker, "data")
+        # Same layout try_run expects for the CSV fallback
+        df.to_csv(os.path.join("data", f"Data_{ticker}.csv"), index=False)
+
+    features = df.columns.drop("Date").tolist()
+    torch.manual_seed(SEED)
+    model = CTTS(input_dim=len(features)).eval()
+    scaler = MinMaxScaler().fit(df[features].to_numpy(dtype=np.float64))
+    save_artifact(os.path.join("models", "model.pth"), model, scaler, features, seq_length)
+    return features
+
+
+def percentile(samples, q):
+    return float(np.percentile(samples, q)) * 1e3 if samples else None
+
+
+def max_rss_mb():
+    # Linux reports KiB, macOS bytes
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / 2**20 if sys.platform == "darwin" else rss / 2**10
+
+
+def measure(fn, repeats, warmup=2, items=1):
+    """
+    Time `fn` and report latency percentiles (ms), throughput (items/s), the
+    peak Python/numpy allocation of one extra traced run (MB; torch tensors
+    are not traced) and the process peak RSS so far.
+    """
+    for _ in range(warmup):
+        fn()
+    samples = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+
+    # Memory is traced separately, since tracemalloc slows the timed runs down
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        "repeats": repeats,
+        "p50_ms": percentile(samples, 50),
+        "p99_ms": percentile(samples, 99),
+        "mean_ms": float(np.mean(samples)) * 1e3,
+        "throughput": items / float(np.median(samples)),
+        "peak_mb": peak / 2**20,
+        "max_rss_mb": max_rss_mb(),
+    }
+
+
+def bench_indicators(quick):
+    n = 2_000 if quick else 20_000
+    df = synthetic_ohlcv(n)[["Date", "Close", "High", "Low", "Open", "Volume"]]
+    cases = {}
+
+    try:
+        from dataset import compute_technical_indicators
+        cases[f"indicators/batch[n={n}]"] = (lambda: compute_technical_indicators(df), n)
+    except ImportError as e:
+        cases[f"indicators/batch[n={n}]"] = f"skipped: {e}"
+
+    def incremental():
+        from indicators import IncrementalIndicators
+        engine = IncrementalIndicators()
+        for close in closes:
+            engine.update_close(close)
+
+    closes = df["Close"].tolist()
+    cases[f"indicators/incremental[n={n}]"] = (incremental, n)
+    return cases
+
+
+def bench_windows(quick):
+    from windowing import create_sequences, SequenceDataset
+
+    n, seq_length = (5_000, 100) if quick else (50_000, 300)
+    data = np.random.default_rng(SEED).random((n, 12)).astype(np.float32)
+    dataset = SequenceDataset(data, seq_length)
+    batch = np.arange(0, len(dataset), max(len(dataset) // 256, 1))[:256]
+
+    return {
+        f"windows/create_sequences[n={n},L={seq_length}]": (lambda: create_sequences(data, seq_length), n - seq_length),
+        f"windows/dataset_batch[b=256,L={seq_length}]": (lambda: torch.stack([dataset[i][0] for i in batch]), len(batch)),
+    }
+
+
+def bench_model(quick):
+    from model import CTTS
+
+    torch.manual_seed(SEED)
+    model = CTTS(input_dim=12).eval()
+    batch_sizes = [1, 8] if quick else [1, 8, 64]
+    seq_lengths = [100, 300] if quick else [100, 300, 1000]
+
+    cases = {}
+    for batch_size in batch_sizes:
+        for seq_length in seq_lengths:
+            x = torch.rand(batch_size, seq_length, 12)
+
+            def forward(x=x):
+                with torch.inference_mode():
+                    model(x)
+
+            cases[f"model/forward[b={batch_size},L={seq_length}]"] = (forward, batch_size)
+    return cases
+
+
+def bench_inference(quick, seq_length):
+    from try_run import predict_price
+    from inference import predict_batch
+
+    steps = 10 if quick else 50
+    return {
+        f"inference/predict_price[steps={steps}]": (lambda: predict_price(TICKERS[0], steps, seq_length), steps),
+        f"inference/predict_batch[tickers={len(TICKERS)},steps={steps}]": (
+            lambda: predict_batch([(ticker, None, steps) for ticker in TICKERS], seq_length), len(TICKERS) * steps),
+    }
+
+
+def bench_protocol(quick):
+    """
+    Decoding one feed frame: JSON objects of strings (one per bar) against a
+    binary tick_protocol frame carrying the same bars.
+    """
+    from tick_protocol import encode_frame, decode_frame
+
+    n = 1_000 if quick else 10_000
+    bars = synthetic_ohlcv(n, SEED + 7)
+    columns = ["Close", "High", "Low", "Open", "Volume"]
+    messages = [json.dumps({"ticker": TICKERS[i % len(TICKERS)], "Datetime": str(row.Date),
+                            **{column: str(getattr(row, column)) for column in columns}})
+                for i, row in enumerate(bars.itertuples())]
+    times = bars["Date"].to_numpy().astype("datetime64[ms]").astype(np.int64)
+    frame = encode_frame(TICKERS, np.arange(n) % len(TICKERS), times, bars[columns].to_numpy())
+
+    def parse_json():
+        for message in messages:
+            data = json.loads(message)
+            [float(data[column]) for column in columns]
+
+    return {
+        f"protocol/json[bars={n}]": (parse_json, n),
+        f"protocol/binary[bars={n}]": (lambda: decode_frame(frame), n),
+    }
+
+
+def bench_backtest(quick):
+    from backtest import run_backtest
+    from try_run import simulate_dynamic_portfolio_trading, simulate_trading_with_gemini
+
+    n = 500 if quick else 5_000
+    rng = np.random.default_rng(SEED)
+    stock_data = {
+        ticker: (list(1000 * np.exp(np.cumsum(rng.normal(0, 0.01, n)))), list(1000 * np.exp(np.cumsum(rng.normal(0, 0.01, n)))))
+        for ticker in TICKERS
+    }
+    days = n * len(TICKERS)
+    return {
+        f"backtest/run_backtest[days={n}]": (lambda: run_backtest(stock_data, 10000, 5, 0.02), days),
+        f"backtest/dynamic_portfolio[days={n}]": (lambda: simulate_dynamic_portfolio_trading(stock_data), days),
+        f"backtest/trading_with_gemini[days={n},explain=False]": (
+            lambda: simulate_trading_with_gemini(stock_data, explain=False), days),
+    }
+
+
+class RecordingSocket:
+    """
+    Stands in for the websocket: records when each decision log is sent.
+    """
+
+    def __init__(self):
+        self.sent = {}
+        self.lock = threading.Lock()
+
+    def send(self, message):
+        content = json.loads(message).get("content", {})
+        if "Reason" not in content:
+            with self.lock:
+                self.sent[content.get("Datetime")] = time.perf_counter()
+
+
+def bench_ticks(quick, seq_length):
+    """
+    End-to-end socket_handler tick handling: ticks are submitted at full
+    speed and the pipeline drained. Latency is submit -> decision sent, for
+    the ticks that got a decision (the rest were coalesced away).
+    """
+    import socket_handler
+
+    n = 200 if quick else 2_000
+    bars = synthetic_ohlcv(n, SEED + 99)
+    ticks = [
+        {"ticker": TICKERS[i % len(TICKERS)], "Datetime": str(row.Date), "Close": str(row.Close), "High": str(row.High),
+         "Low": str(row.Low), "Open": str(row.Open), "Volume": str(row.Volume)}
+        for i, row in enumerate(bars.itertuples())
+    ]
+
+    pipeline = socket_handler.TickPipeline(seq_length=seq_length)
+    socket = RecordingSocket()
+    pipeline.start(socket)
+    for ticker in TICKERS:
+        pipeline.states[ticker] = socket_handler.TickerState(ticker, seq_length)
+
+    submitted = {}
+    # Drained once the last tick of every ticker was decided (coalescing guarantees it is)
+    last = {tick["ticker"]: tick["Datetime"] for tick in ticks}
+    # The pipeline prints every message it sends; keep the report readable
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        start = time.perf_counter()
+        for tick in ticks:
+            submitted[tick["Datetime"]] = time.perf_counter()
+            pipeline.submit(tick)
+
+        deadline = time.perf_counter() + 300
+        while time.perf_counter() < deadline:
+            with socket.lock:
+                if all(stamp in socket.sent for stamp in last.values()):
+                    break
+            time.sleep(0.001)
+        elapsed = time.perf_counter() - start
+
+    latencies = sorted(socket.sent[stamp] - submitted[stamp] for stamp in socket.sent if stamp in submitted)
+    return {
+        f"pipeline/ticks[n={n},tickers={len(TICKERS)}]": {
+            "repeats": 1,
+            "p50_ms": percentile(latencies, 50),
+            "p99_ms": percentile(latencies, 99),
+            "mean_ms": float(np.mean(latencies)) * 1e3 if latencies else None,
+            "throughput": n / elapsed,
+            "decisions": len(latencies),
+            "dropped_ticks": pipeline.dropped_ticks,
+            "max_rss_mb": max_rss_mb(),
+        }
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(quick=False, only=None, repeats=20, threads=1, seq_length=100):
+    torch.set_num_threads(threads)
+    np.random.seed(SEED)
+
+    meta = {
+        "commit": git_commit(),
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "torch": torch.__version__,
+        "numpy": np.__version__,
+        "machine": platform.machine(),
+        "cpus": os.cpu_count(),
+        "threads": threads,
+        "quick": quick,
+    }
+    results = {}
+
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as workspace:
+        os.chdir(workspace)
+        try:
+            build_workspace(5_000 if quick else 20_000, seq_length)
+            groups = [
+                lambda: bench_indicators(quick),
+                lambda: bench_windows(quick),
+                lambda: bench_model(quick),
+                lambda: bench_inference(quick, seq_length),
+                lambda: bench_protocol(quick),
+                lambda: bench_backtest(quick),
+            ]
+            for group in groups:
+                for name, case in group().items():
+                    if only and only not in name:
+                        continue
+                    if isinstance(case, str):
+                        results[name] = {"skipped": case}
+                    else:
+                        fn, items = case
+                        # predict_price and friends print progress on every call
+                        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+                            results[name] = measure(fn, repeats, items=items)
+                    print(format_row(name, results[name]))
+
+            if not only or only in "pipeline/ticks":
+                for name, metrics in bench_ticks(quick, seq_length).items():
+                    results[name] = metrics
+                    print(format_row(name, metrics))
+        finally:
+            os.chdir(cwd)
+
+    return {"meta": meta, "results": results}
+
+
+def format_row(name, metrics):
+    if "skipped" in metrics:
+        return f"{name:<55} {metrics['skipped']}"
+    peak = f"{metrics['peak_mb']:>9.1f}" if "peak_mb" in metrics else f"{'-':>9}"
+    return (f"{name:<55} {metrics['p50_ms']:>10.3f} {metrics['p99_ms']:>10.3f} {metrics['throughput']:>12.1f} {peak}"
+            f" {metrics['max_rss_mb']:>8.0f}")
+
+
+def compare(baseline, current, threshold=REGRESSION_THRESHOLD):
+    """
+    Print p50 changes against a baseline; returns the names that regressed.
+    """
+    regressions = []
+    print(f"\n{'case':<55} {'base p50':>10} {'p50':>10} {'change':>8}")
+    for name, metrics in current["results"].items():
+        base = baseline["results"].get(name)
+        if not base or "p50_ms" not in base or "p50_ms" not in metrics:
+            continue
+        change = metrics["p50_ms"] / base["p50_ms"] - 1
+        flag = "  REGRESSION" if change > threshold else ""
+        if flag:
+            regressions.append(name)
+        print(f"{name:<55} {base['p50_ms']:>10.3f} {metrics['p50_ms']:>10.3f} {change:>+8.1%}{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the data -> features -> inference -> backtest pipeline on synthetic data.")
+    parser.add_argument("--quick", action="store_true", help="Smaller inputs, for a fast check")
+    parser.add_argument("--only", help="Run only cases whose name contains this")
+    parser.add_argument("--repeats", type=int, default=20)
+    parser.add_argument("--threads", type=int, default=1, help="torch threads (fixed for comparable numbers)")
+    parser.add_argument("--seq-length", type=int, default=100)
+    parser.add_argument("--out", help=f"JSON results path (default {RESULTS_DIR}/<commit>.json)")
+    parser.add_argument("--compare", help="Baseline JSON to compare against")
+    parser.add_argument("--threshold", type=float, default=REGRESSION_THRESHOLD)
+    parser.add_argument("--fail-on-regression", action="store_true")
+    args = parser.parse_args()
+
+    print(f"{'case':<55} {'p50 ms':>10} {'p99 ms':>10} {'items/s':>12} {'peak MB':>9} {'RSS MB':>8}")
+    report = run(args.quick, args.only, args.repeats, args.threads, args.seq_length)
+
+    out = args.out or os.path.join(RESULTS_DIR, f"{report['meta']['commit'] or 'local'}{'-quick' if args.quick else ''}.json")
+    os.makedirs(os.path.dirname(out) or ".", exist_ok=True)
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nSaved results to {out}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            regressions = compare(json.load(f), report, args.threshold)
+        if regressions and args.fail_on_regression:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
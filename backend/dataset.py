@@ -1,7 +1,15 @@
+import os
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import numpy as np
 import pandas as pd
 import yfinance as yf
 import pandas_ta as ta
+import feature_store
+from feature_store import write_store
+from indicators import INDICATOR_COLUMNS, load_engine, save_engine
+
+TICKERS = ["RELIANCE.NS", "INFY.NS", "ITC.NS"]
+RAW_COLUMNS = ["Close", "High", "Low", "Open", "Volume"]
 
 def download_stock_data(ticker, period='1mo', interval='1m'):
     """
@@ -14,9 +22,12 @@ def download_stock_data(ticker, period='1mo', interval='1m'):
     # df['Datetime'] = pd.to_datetime(df['Datetime'])  # Ensure it's properly formatted
     return df
 
-def compute_technical_indicators(df):
+def compute_technical_indicators(df, backfill=True):
     """
     Compute technical indicators using pandas-ta and add them as columns.
+
+    With backfill=False the warm-up rows stay NaN instead of borrowing values
+    from later bars, matching indicators.IncrementalIndicators row for row.
     """
     df = df.copy()
     
@@ -32,22 +43,106 @@ def compute_technical_indicators(df):
     df.ta.macd(append=True)  # MACD
     
     # Fill missing values
-    df.fillna(method='bfill', inplace=True)
+    if backfill:
+        df.bfill(inplace=True)
     return df
 
-def main():
-    # Get user input for 3 tickers
-    tickers = ["RELIANCE.NS", "INFY.NS", "ITC.NS"]
-    
-    # Process each ticker separately and save individual files
-    for ticker in tickers:
-        # Download and compute indicators
-        df = download_stock_data(ticker, period='2y', interval='1d')
-        df = compute_technical_indicators(df)
-        
-        # Save individual file
-        df.to_csv(f"Data/Data_{ticker}.csv", index=False)
-        print(f"Saved data for {ticker}")
+class YFinanceSource:
+    """
+    Bars from yfinance. Uses Ticker.history, which unlike yf.download is safe
+    to call from several threads at once.
+    """
+
+    def __init__(self, period='2y', interval='1d'):
+        self.period = period
+        self.interval = interval
+
+    def fetch(self, ticker, start=None):
+        history = yf.Ticker(ticker)
+        if start is None:
+            df = history.history(period=self.period, interval=self.interval)
+        else:
+            df = history.history(start=start, interval=self.interval)
+        df.index = df.index.tz_localize(None)  # wall-clock time, as yf.download writes it
+        df = df[RAW_COLUMNS].dropna()
+        return df.reset_index()
+
+
+class ReplaySource:
+    """
+    Bars replayed from local CSVs ({directory}/{ticker}.csv with a Date or
+    Datetime column plus OHLCV), for offline runs and tests.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+
+    def fetch(self, ticker, start=None):
+        df = pd.read_csv(os.path.join(self.directory, f"{ticker}.csv"))
+        if start is not None:
+            time_column = next(c for c in feature_store.TIME_COLUMNS if c in df.columns)
+            df = df[pd.to_datetime(df[time_column]) >= pd.Timestamp(start)]
+        return df.reset_index(drop=True)
+
+
+def ingest_ticker(ticker, source, data_dir="data"):
+    """
+    Bring one ticker's CSV and feature store up to date; returns the number of new bars.
+
+    The first run downloads the full history; later runs fetch only bars newer
+    than the last stored timestamp and extend the indicators incrementally.
+    """
+    csv_path = feature_store.csv_path(ticker, data_dir)
+
+    if not feature_store.store_exists(ticker, data_dir):
+        print("Downloading data for " + ticker)
+        df = compute_technical_indicators(source.fetch(ticker))
+        df.to_csv(csv_path, index=False)
+        write_store(df, ticker, data_dir)
+        save_engine(load_engine(ticker, data_dir), ticker, data_dir)
+        return len(df)
+
+    meta = feature_store.read_meta(ticker, data_dir)
+    last = pd.Timestamp(meta["last_timestamp"], unit="ns")
+    df = source.fetch(ticker, start=last)
+    time_column = next(c for c in feature_store.TIME_COLUMNS if c in df.columns)
+    df = df[pd.to_datetime(df[time_column]) > last]
+    if df.empty:
+        return 0
+
+    engine = load_engine(ticker, data_dir)
+    indicators = [engine.update_close(close) for close in df["Close"].astype(float).tolist()]
+    df = df.copy()
+    df[INDICATOR_COLUMNS] = np.array(indicators, dtype=np.float64)
+
+    columns = [time_column] + meta["columns"]
+    df[columns].to_csv(csv_path, mode="a", header=False, index=False)
+    feature_store.append_store(df[columns], ticker, data_dir)
+    save_engine(engine, ticker, data_dir)
+    return len(df)
+
+
+def ingest(tickers, source, data_dir="data", max_workers=8):
+    """
+    Refresh many tickers concurrently; a failing ticker doesn't stop the others.
+    """
+    results = {}
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        futures = {pool.submit(ingest_ticker, ticker, source, data_dir): ticker for ticker in tickers}
+        for future in as_completed(futures):
+            ticker = futures[future]
+            try:
+                results[ticker] = future.result()
+                print(f"Saved {results[ticker]} new bars for {ticker}")
+            except Exception as e:
+                results[ticker] = None
+                print(f"Failed to ingest {ticker}: {e}")
+    return results
+
+
+def main(data_dir="data"):
+    os.makedirs(data_dir, exist_ok=True)
+    ingest(TICKERS, YFinanceSource(period='2y', interval='1d'), data_dir=data_dir)
 
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,240 @@
+import os
+import re
+import json
+import time
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from metrics import metrics
+from atomic import atomic_write
+
+CACHE_DIR = os.path.join("cache", "explanations")
+BATCH_SIZE = 20  # trades per LLM prompt
+MAX_CONCURRENCY = 2  # LLM requests in flight
+REQUESTS_PER_MINUTE = 15
+PRICE_DECIMALS = 2  # rounding applied to prices in the cache key
+ERROR_REASON = "No reason generated (API error)."
+
+
+def build_prompt(stock, action, current_price, predicted_future, history):
+    return f"""
+You are an expert trading bot. Analyze the following stock data and explain why taking the action '{action}' on {stock} is a good move.
+
+Current price: {current_price}
+Recent actual prices: {history[-5:]}
+Predicted future prices: {predicted_future}
+
+Try to include patterns, trends, or candlestick behavior (if visible), and keep it to one sentence.
+"""
+
+
+def build_batch_prompt(items):
+    trades = "\n".join(
+        f"{i}. Action '{action}' on {stock}. Current price: {current_price}. "
+        f"Recent actual prices: {list(history[-5:])}. Predicted future prices: {list(predicted_future)}."
+        for i, (stock, action, current_price, predicted_future, history) in enumerate(items, 1)
+    )
+    return f"""
+You are an expert trading bot. For each numbered trade below, explain in one sentence why taking that action is a good move.
+Try to include patterns, trends, or candlestick behavior (if visible).
+
+{trades}
+
+Answer with exactly {len(items)} lines, each formatted as "<number>. <sentence>", in the same order.
+"""
+
+
+def parse_batch_response(text, n):
+    reasons = [None] * n
+    for line in text.splitlines():
+        match = re.match(r"\s*(\d+)[.)]\s*(.+)", line)
+        if match and 1 <= int(match.group(1)) <= n:
+            reasons[int(match.group(1)) - 1] = match.group(2).strip()
+    return reasons
+
+
+class TokenBucket:
+    """
+    Blocking rate limiter: `rate` tokens per second, bursts up to `capacity`.
+    """
+
+    def __init__(self, rate, capacity=1):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+class ExplanationCache:
+    """
+    One small file per explanation under `directory`, keyed by the trade
+    context with prices rounded to PRICE_DECIMALS.
+    """
+
+    def __init__(self, directory=CACHE_DIR, decimals=PRICE_DECIMALS):
+        self.directory = directory
+        self.decimals = decimals
+        self.memory = {}
+        self.lock = threading.Lock()
+
+    def key(self, stock, action, current_price, predicted_future, history):
+        rounded = lambda values: [round(float(v), self.decimals) for v in values]
+        context = [stock, action, round(float(current_price), self.decimals), rounded(predicted_future), rounded(history[-5:])]
+        return hashlib.sha1(json.dumps(context).encode("utf-8")).hexdigest()
+
+    def get(self, key):
+        with self.lock:
+            if key in self.memory:
+                return self.memory[key]
+        path = os.path.join(self.directory, key + ".txt")
+        if not os.path.exists(path):
+            return None
+        with open(path, encoding="utf-8") as f:
+            reason = f.read()
+        with self.lock:
+            self.memory[key] = reason
+        return reason
+
+    def put(self, key, reason):
+        with self.lock:
+            self.memory[key] = reason
+        os.makedirs(self.directory, exist_ok=True)
+        with atomic_write(os.path.join(self.directory, key + ".txt")) as tmp_path, open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(reason)
+
+
+class GeminiBackend:
+    name = "gemini"
+    requests_per_minute = REQUESTS_PER_MINUTE
+
+    def __init__(self, model_name="gemini-2.0-flash", api_key=None):
+        import google.generativeai as genai
+
+        # Setup Gemini
+        genai.configure(api_key=api_key or os.environ["GEMINI_API_KEY"])
+        self.model = genai.GenerativeModel(model_name)
+
+    def explain(self, items):
+        if len(items) == 1:
+            response = self.model.generate_content(build_prompt(*items[0]))
+            return [response.text.strip()]
+        response = self.model.generate_content(build_batch_prompt(items))
+        return parse_batch_response(response.text, len(items))
+
+
+class StubBackend:
+    """
+    Deterministic, offline stand-in for the LLM, for tests and CI.
+    """
+
+    name = "stub"
+    requests_per_minute = None  # local, so never throttled
+
+    def explain(self, items):
+        reasons = []
+        for stock, action, current_price, predicted_future, history in items:
+            future = list(predicted_future)
+            outlook = sum(future) / len(future) if future else current_price
+            reasons.append(f"{action} {stock} at {float(current_price):.2f}: predicted average {float(outlook):.2f}.")
+        return reasons
+
+
+class Explainer:
+    """
+    Cached, batched and rate-limited trade explanations.
+
+    Each item is (stock, action, current_price, predicted_future, history),
+    the same arguments as try_run.get_reason_from_gemini.
+    """
+
+    def __init__(self, backend, cache=None, batch_size=BATCH_SIZE, max_concurrency=MAX_CONCURRENCY,
+                 requests_per_minute=None):
+        self.backend = backend
+        # Cached per backend so stub output never stands in for real explanations
+        self.cache = cache if cache is not None else ExplanationCache(os.path.join(CACHE_DIR, backend.name))
+        self.batch_size = batch_size
+        requests_per_minute = requests_per_minute or backend.requests_per_minute
+        self.limiter = TokenBucket(requests_per_minute / 60.0, capacity=max_concurrency) if requests_per_minute else None
+        self.pool = ThreadPoolExecutor(max_workers=max_concurrency)
+        self.deferred = ThreadPoolExecutor(max_workers=1)  # waits on self.pool, so kept separate
+
+    def explain_batch(self, items):
+        if self.limiter:
+            self.limiter.acquire()
+        metrics.inc("llm_requests")
+        try:
+            with metrics.span("llm"):
+                return self.backend.explain(items)
+        except Exception:
+            metrics.inc("llm_errors")
+            return [None] * len(items)
+
+    def explain(self, items):
+        """
+        Return one reason per item, in order.
+        """
+        keys = [self.cache.key(*item) for item in items]
+        reasons = [self.cache.get(key) for key in keys]
+        metrics.inc("explanation_cache_hits", sum(reason is not None for reason in reasons))
+
+        # Identical trades share one request
+        missing = {}
+        for i, (key, reason) in enumerate(zip(keys, reasons)):
+            if reason is None:
+                missing.setdefault(key, []).append(i)
+        todo = list(missing)
+
+        batches = [todo[i:i + self.batch_size] for i in range(0, len(todo), self.batch_size)]
+        futures = [self.pool.submit(self.explain_batch, [items[missing[key][0]] for key in batch]) for batch in batches]
+        for batch, future in zip(batches, futures):
+            for key, reason in zip(batch, future.result()):
+                if reason:
+                    self.cache.put(key, reason)
+                for i in missing[key]:
+                    reasons[i] = reason or ERROR_REASON
+        return reasons
+
+    def explain_async(self, items):
+        """
+        Like explain, but returns a Future so callers can carry on meanwhile.
+        """
+        return self.deferred.submit(self.explain, items)
+
+
+def make_backend(name=None):
+    name = name or os.getenv("EXPLANATION_BACKEND", "gemini")
+    if name == "stub":
+        return StubBackend()
+    if not os.getenv("GEMINI_API_KEY"):
+        print("⚠️ GEMINI_API_KEY is not set; using the offline stub explanations")
+        return StubBackend()
+    return GeminiBackend()
+
+
+explainer = None
+explainer_lock = threading.Lock()
+
+
+def get_explainer():
+    """
+    Process-wide explainer, created on first use (EXPLANATION_BACKEND=stub for offline runs).
+    """
+    global explainer
+    with explainer_lock:
+        if explainer is None:
+            explainer = Explainer(make_backend())
+        return explainer
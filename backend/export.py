@@ -0,0 +1,243 @@
+import os
+import copy
+import argparse
+import threading
+
+import numpy as np
+import torch
+import torch.nn as nn
+from torch.nn.utils.fusion import fuse_conv_bn_eval
+
+from artifacts import load_artifact
+from atomic import atomic_write
+
+BACKENDS = ("eager", "torchscript", "onnx")
+EXTENSIONS = {"torchscript": ".ts", "onnx": ".onnx"}
+
+# Max |exported - eager| on scaled outputs; int8 weights cost a few 1e-3
+PARITY_TOLERANCE = 1e-4
+QUANTIZED_PARITY_TOLERANCE = 2e-2
+
+
+def load_checkpoint(path, input_dim=None, device="cpu"):
+    artifact = load_artifact(path)
+    if input_dim is not None and input_dim != artifact.input_dim:
+        raise ValueError(f"{path} expects {artifact.input_dim} features, got {input_dim}")
+    return artifact.build_model(device)
+
+
+def fold_batchnorm(model):
+    """
+    Copy of an eval-mode CTTS with bn1/bn2 folded into conv1/conv2.
+    """
+    folded = copy.deepcopy(model).eval()
+    folded.conv1 = fuse_conv_bn_eval(folded.conv1, folded.bn1)
+    folded.conv2 = fuse_conv_bn_eval(folded.conv2, folded.bn2)
+    folded.bn1 = nn.Identity()
+    folded.bn2 = nn.Identity()
+    return folded
+
+
+def quantize(model):
+    """
+    Dynamic int8 quantization of fc1/fc2 and the transformer feed-forward
+    layers (CPU only). The attention projections are left in float32, as
+    PyTorch does not quantize them dynamically.
+    """
+    return torch.ao.quantization.quantize_dynamic(model, {nn.Linear}, dtype=torch.qint8)
+
+
+def exported_path(checkpoint, backend, seq_length=100):
+    # Exported per window length: tracing records the shapes it was run with
+    return f"{os.path.splitext(checkpoint)[0]}.{seq_length}{EXTENSIONS[backend]}"
+
+
+def is_stale(path, checkpoint):
+    return not os.path.exists(path) or os.stat(path).st_mtime_ns < os.stat(checkpoint).st_mtime_ns
+
+
+def example_inputs(model, seq_length, batch_size=1, generator=None):
+    # A window batch, plus ticker ids for shared multi-ticker models
+    windows = torch.rand(batch_size, seq_length, model.conv1.in_channels, generator=generator)
+    if not model.num_tickers:
+        return (windows,)
+    return windows, torch.randint(model.num_tickers, (batch_size,), generator=generator)
+
+
+def disable_fastpath(model):
+    """
+    Keep the encoder layers of an export copy off their fused inference op,
+    which takes neither quantized linears nor ONNX export. Unlike the
+    process-wide torch.backends.mha switch this only affects `model`, so
+    models being served keep the fast path while another thread exports.
+    """
+    for layer in model.transformer.layers:
+        layer.activation_relu_or_gelu = 0  # any falsy value routes forward() to the unfused path
+    return model
+
+
+def export_torchscript(model, path, seq_length=100, quantized=True):
+    if model.attention == "local":
+        # Tracing freezes the block layout (and whether blocks are used at all) for one window length
+        raise ValueError("TorchScript export of attention='local' models is not supported; use the eager or onnx backend")
+
+    model = disable_fastpath(fold_batchnorm(model.cpu()))
+    if quantized:
+        model = quantize(model)
+
+    with torch.no_grad():
+        traced = torch.jit.trace(model, example_inputs(model, seq_length))
+
+    with atomic_write(path) as tmp_path:
+        torch.jit.save(traced, tmp_path)
+    return path
+
+
+def export_onnx(model, path, seq_length=100, quantized=False):
+    """
+    Export for windows of `seq_length` rows with a dynamic batch axis (the
+    attention reshapes are traced with a fixed length). With `quantized`, MatMul
+    weights are converted to int8 by onnxruntime; on our x86 nodes the
+    float32 graph was faster, so it is off by default.
+    """
+    model = disable_fastpath(fold_batchnorm(model.cpu()))
+    inputs = ["window", "ticker"][:len(example_inputs(model, seq_length))]
+    # MultiheadAttention has a fused op of its own, which it skips while grad
+    # is on; grad mode is per thread, so serving threads are unaffected
+    with atomic_write(path) as tmp_path:
+        with torch.enable_grad():
+            torch.onnx.export(
+                model,
+                example_inputs(model, seq_length),
+                tmp_path,
+                input_names=inputs,
+                output_names=["prediction"],
+                dynamic_axes={**{name: {0: "batch"} for name in inputs}, "prediction": {0: "batch"}},
+                dynamo=False,
+            )
+        if quantized:
+            from onnxruntime.quantization import quantize_dynamic, QuantType
+
+            with atomic_write(tmp_path) as quantized_path:
+                quantize_dynamic(tmp_path, quantized_path, weight_type=QuantType.QInt8)
+    return path
+
+
+class OnnxModel:
+    """
+    onnxruntime sessions with the call signature of CTTS: a (batch, seq_length,
+    features) tensor in, a (batch, output_dim) tensor out on the same device.
+    A graph is exported next to the checkpoint the first time a window length
+    is seen.
+    """
+
+    def __init__(self, checkpoint, input_dim):
+        self.checkpoint = checkpoint
+        self.input_dim = input_dim
+        self.sessions = {}
+        self.lock = threading.Lock()
+
+    def export(self, seq_length):
+        """
+        Export the graph for `seq_length` if it is missing or stale, without
+        opening a session (safe to call before forking workers).
+        """
+        path = exported_path(self.checkpoint, "onnx", seq_length)
+        if is_stale(path, self.checkpoint):
+            export_onnx(load_checkpoint(self.checkpoint, self.input_dim), path, seq_length)
+            print(f"Exported {self.checkpoint} -> {path}")
+        return path
+
+    def session(self, seq_length):
+        import onnxruntime as ort
+
+        with self.lock:
+            if seq_length not in self.sessions:
+                path = self.export(seq_length)
+                self.sessions[seq_length] = ort.InferenceSession(path, providers=["CPUExecutionProvider"])
+            return self.sessions[seq_length]
+
+    def __call__(self, x, ticker_ids=None):
+        window = np.ascontiguousarray(x.detach().cpu().numpy(), dtype=np.float32)
+        feed = {"window": window}
+        if ticker_ids is not None:
+            feed["ticker"] = ticker_ids.cpu().numpy().astype(np.int64)
+        output = self.session(window.shape[1]).run(None, feed)[0]
+        return torch.from_numpy(output).to(x.device)
+
+
+def load_backend(checkpoint, input_dim, backend="eager", device="cpu", seq_length=100):
+    """
+    Load a checkpoint for inference with the given backend.
+
+    TorchScript and ONNX artifacts live next to the checkpoint and are
+    (re)exported whenever they are missing or older than it. TorchScript is
+    traced for windows of `seq_length` rows; the ONNX model exports a graph
+    per window length as it sees them.
+    """
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown inference backend {backend!r}; expected one of {BACKENDS}")
+    if backend == "eager":
+        return load_checkpoint(checkpoint, input_dim, device)
+    if backend == "onnx":
+        return OnnxModel(checkpoint, input_dim)
+
+    path = exported_path(checkpoint, backend, seq_length)
+    if is_stale(path, checkpoint):
+        # Quantized kernels only run on the CPU
+        export_torchscript(load_checkpoint(checkpoint, input_dim), path, seq_length, quantized=torch.device(device).type == "cpu")
+        print(f"Exported {checkpoint} -> {path}")
+    return torch.jit.load(path, map_location=device).eval()
+
+
+def check_parity(checkpoint, backend, seq_length=100, batch_size=8, seed=0):
+    """
+    Max absolute difference between `backend` and eager outputs on random
+    scaled windows.
+    """
+    eager = load_checkpoint(checkpoint)
+    exported = load_backend(checkpoint, eager.conv1.in_channels, backend, seq_length=seq_length)
+
+    inputs = example_inputs(eager, seq_length, batch_size, torch.Generator().manual_seed(seed))
+    with torch.inference_mode():
+        expected = eager(*inputs)
+        actual = exported(*inputs)
+    return (actual - expected).abs().max().item()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export CTTS checkpoints and check them against eager PyTorch.")
+    parser.add_argument("checkpoints", nargs="*", default=[os.path.join("models", "model.pth")])
+    parser.add_argument("--backend", choices=BACKENDS[1:], nargs="+", default=list(BACKENDS[1:]))
+    parser.add_argument("--seq-length", type=int, default=100)
+    parser.add_argument("--no-quantize", action="store_true", help="Keep TorchScript weights in float32")
+    parser.add_argument("--quantize-onnx", action="store_true", help="int8 MatMul weights in the ONNX graph")
+    args = parser.parse_args()
+
+    failed = False
+    for checkpoint in args.checkpoints:
+        model = load_checkpoint(checkpoint)
+        for backend in args.backend:
+            if backend == "torchscript" and model.attention == "local":
+                print(f"{checkpoint}: skipping TorchScript, which doesn't support attention='local'")
+                continue
+            path = exported_path(checkpoint, backend, args.seq_length)
+            if backend == "torchscript":
+                quantized = not args.no_quantize
+                export_torchscript(model, path, args.seq_length, quantized)
+            else:
+                quantized = args.quantize_onnx
+                export_onnx(model, path, args.seq_length, quantized)
+
+            diff = check_parity(checkpoint, backend, args.seq_length)
+            tolerance = QUANTIZED_PARITY_TOLERANCE if quantized else PARITY_TOLERANCE
+            status = "ok" if diff <= tolerance else "FAILED"
+            failed |= diff > tolerance
+            print(f"{path}: max |diff| vs eager = {diff:.2e} (tolerance {tolerance:.0e}) {status}")
+
+    if failed:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
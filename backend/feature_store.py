@@ -0,0 +1,199 @@
+import os
+import json
+import numpy as np
+import pandas as pd
+from sklearn.preprocessing import MinMaxScaler
+from atomic import atomic_write
+
+STORE_VERSION = 1
+TIME_COLUMNS = ("Date", "Datetime")
+
+# Layout of {data_dir}/store/{ticker}/:
+#   features.bin    float32, row-major (rows x columns), memory-mappable
+#   timestamps.bin  int64 nanoseconds since epoch, one per row
+#   meta.json       column order, row count and per-column min/max for scaling
+
+
+def store_dir(ticker, data_dir="data"):
+    return os.path.join(data_dir, "store", ticker)
+
+
+def csv_path(ticker, data_dir="data"):
+    return os.path.join(data_dir, f"Data_{ticker}.csv")
+
+
+def store_exists(ticker, data_dir="data"):
+    return os.path.exists(os.path.join(store_dir(ticker, data_dir), "meta.json"))
+
+
+def version_path(ticker, data_dir="data"):
+    """
+    File whose mtime changes whenever the ticker's data changes.
+    """
+    if store_exists(ticker, data_dir):
+        return os.path.join(store_dir(ticker, data_dir), "meta.json")
+    return csv_path(ticker, data_dir)
+
+
+def split_time_column(df):
+    time_column = next((c for c in TIME_COLUMNS if c in df.columns), None)
+    if time_column is None:
+        return None, df
+    times = pd.to_datetime(df[time_column], utc=True).dt.tz_localize(None)
+    timestamps = times.to_numpy(dtype="datetime64[ns]").view(np.int64)
+    return timestamps, df.drop(columns=[time_column])
+
+
+def replace_file(path, array):
+    # Live memory maps keep the old file
+    with atomic_write(path) as tmp_path:
+        array.tofile(tmp_path)
+
+
+def write_store(df, ticker, data_dir="data"):
+    """
+    Write a DataFrame of indicators (with a Date/Datetime column) as a typed, columnar store.
+    """
+    timestamps, df = split_time_column(df)
+    values = df.to_numpy(dtype=np.float64)
+
+    path = store_dir(ticker, data_dir)
+    os.makedirs(path, exist_ok=True)
+    replace_file(os.path.join(path, "features.bin"), values.astype(np.float32))
+    if timestamps is not None:
+        replace_file(os.path.join(path, "timestamps.bin"), timestamps.astype(np.int64))
+
+    # Scaler stats come from the float64 values so they match a scaler fit on the CSV
+    meta = {
+        "version": STORE_VERSION,
+        "columns": df.columns.tolist(),
+        "rows": len(values),
+        "dtype": "float32",
+        "data_min": np.nanmin(values, axis=0).tolist() if len(values) else [],
+        "data_max": np.nanmax(values, axis=0).tolist() if len(values) else [],
+        "last_timestamp": int(timestamps[-1]) if timestamps is not None and len(timestamps) else None,
+    }
+    # meta.json goes last: readers treat it as the commit marker and version
+    write_meta(meta, ticker, data_dir)
+    return meta
+
+
+def write_meta(meta, ticker, data_dir="data"):
+    path = os.path.join(store_dir(ticker, data_dir), "meta.json")
+    with atomic_write(path) as tmp_path, open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(meta, f)
+
+
+def append_store(df, ticker, data_dir="data"):
+    """
+    Append new rows to an existing store in place; O(new rows).
+
+    `df` must carry the stored columns (in any order) and a Date/Datetime column.
+    """
+    meta = read_meta(ticker, data_dir)
+    timestamps, df = split_time_column(df)
+    values = df[meta["columns"]].to_numpy(dtype=np.float64)
+    if len(values) == 0:
+        return meta
+
+    path = store_dir(ticker, data_dir)
+    with open(os.path.join(path, "features.bin"), "ab") as f:
+        values.astype(np.float32).tofile(f)
+    if timestamps is not None:
+        with open(os.path.join(path, "timestamps.bin"), "ab") as f:
+            timestamps.astype(np.int64).tofile(f)
+
+    if meta["rows"]:
+        meta["data_min"] = np.fmin(meta["data_min"], np.nanmin(values, axis=0)).tolist()
+        meta["data_max"] = np.fmax(meta["data_max"], np.nanmax(values, axis=0)).tolist()
+    else:
+        meta["data_min"] = np.nanmin(values, axis=0).tolist()
+        meta["data_max"] = np.nanmax(values, axis=0).tolist()
+    meta["rows"] += len(values)
+    if timestamps is not None:
+        meta["last_timestamp"] = int(timestamps[-1])
+
+    # Rows are only visible to readers once meta.json is swapped in
+    write_meta(meta, ticker, data_dir)
+    return meta
+
+
+def read_meta(ticker, data_dir="data"):
+    with open(os.path.join(store_dir(ticker, data_dir), "meta.json"), encoding="utf-8") as f:
+        return json.load(f)
+
+
+def load_store(ticker, data_dir="data", tail=None):
+    """
+    Memory-map a ticker's feature matrix.
+
+    Returns (values, features, meta) where `values` is a read-only float32
+    (rows, features) array backed by the file. With `tail`, only the last
+    `tail` rows are mapped.
+    """
+    meta = read_meta(ticker, data_dir)
+    rows, columns = meta["rows"], meta["columns"]
+    if rows == 0:
+        return np.empty((0, len(columns)), dtype=np.float32), columns, meta
+
+    start = 0 if tail is None else max(rows - tail, 0)
+    values = np.memmap(
+        os.path.join(store_dir(ticker, data_dir), "features.bin"),
+        dtype=np.float32,
+        mode="r",
+        offset=start * len(columns) * 4,
+        shape=(rows - start, len(columns)),
+    )
+    return values, columns, meta
+
+
+def load_timestamps(ticker, data_dir="data"):
+    meta = read_meta(ticker, data_dir)
+    path = os.path.join(store_dir(ticker, data_dir), "timestamps.bin")
+    if not os.path.exists(path) or meta["rows"] == 0:
+        return np.empty((0,), dtype=np.int64)
+    return np.memmap(path, dtype=np.int64, mode="r", shape=(meta["rows"],))
+
+
+def scaler_from_meta(meta):
+    """
+    Rebuild the MinMaxScaler that fitting on the full history would produce.
+    """
+    scaler = MinMaxScaler()
+    scaler.fit(np.array([meta["data_min"], meta["data_max"]], dtype=np.float64))
+    return scaler
+
+
+def load_features(ticker, data_dir="data", tail=None):
+    """
+    Return (values, features, scaler) for a ticker, unscaled.
+
+    Reads the memory-mapped store when one exists (no parsing, scaler from the
+    stored stats) and falls back to the CSV otherwise.
+    """
+    if store_exists(ticker, data_dir):
+        values, features, meta = load_store(ticker, data_dir, tail=tail)
+        return values, features, scaler_from_meta(meta)
+
+    df = pd.read_csv(csv_path(ticker, data_dir))
+    _, df = split_time_column(df)
+    values = df.to_numpy(dtype=np.float64)
+    scaler = MinMaxScaler().fit(values)
+    if tail is not None:
+        values = values[-tail:]
+    return values, df.columns.tolist(), scaler
+
+
+def build_store_from_csv(ticker, data_dir="data"):
+    df = pd.read_csv(csv_path(ticker, data_dir))
+    meta = write_store(df, ticker, data_dir)
+    print(f"Built feature store for {ticker} ({meta['rows']} rows)")
+    return meta
+
+
+if __name__ == "__main__":
+    import sys
+
+    # Convert existing CSVs: python feature_store.py RELIANCE.NS INFY.NS ITC.NS
+    for ticker in sys.argv[1:] or ["RELIANCE.NS", "INFY.NS", "ITC.NS"]:
+        build_store_from_csv(ticker)
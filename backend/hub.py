@@ -0,0 +1,174 @@
+import threading
+from collections import deque
+
+from flask import request
+from flask_socketio import join_room, leave_room, emit
+
+from metrics import metrics
+
+FLUSH_INTERVAL = 0.25  # seconds; updates arriving within it go out as one message per ticker
+MAX_BATCH = 100  # logs per ticker per message; older ones are dropped under bursts
+SNAPSHOT_LOGS = 20  # recent logs sent to a new subscriber
+UPDATE_EVENT = "ticker_update"
+
+# SocketIO protocol:
+#   client -> "subscribe"   {"tickers": ["INFY.NS", ...]}  (or {"ticker": "INFY.NS"})
+#   client -> "unsubscribe" same shape
+#   ack    <- {"subscribed": [...], "rejected": [unknown tickers]}
+#   server -> "ticker_update" {"ticker": ..., "logs": [log content, ...], "prediction": /predict payload}
+#             "logs" and "prediction" are present only when they changed; a new
+#             subscriber first gets the current snapshot of each ticker.
+
+
+def room(ticker):
+    return f"ticker:{ticker}"
+
+
+def requested_tickers(data):
+    data = data or {}
+    tickers = data.get("tickers") or [data.get("ticker")]
+    return [ticker for ticker in tickers if ticker]
+
+
+class Hub:
+    """
+    Per-ticker fan-out over the server's SocketIO instance.
+
+    Producers publish once per decision or prediction; a flusher sends what
+    accumulated for each ticker as one message to its room every
+    FLUSH_INTERVAL, so the cost per update does not depend on how many
+    dashboards are connected, and bursts collapse into batches.
+    """
+
+    def __init__(self, interval=FLUSH_INTERVAL, max_batch=MAX_BATCH):
+        self.interval = interval
+        self.max_batch = max_batch
+        self.socketio = None
+        self.on_subscribe = None
+        self.tickers = None  # tickers clients may subscribe to; None allows any
+        self.requested = set()  # tickers on_subscribe is running for
+        self.failed = set()  # tickers on_subscribe failed for; not retried
+        self.pending = {}  # {ticker: {"logs": deque, "prediction": payload}}
+        self.latest = {}  # {ticker: {"logs": deque, "prediction": payload}}
+        self.lock = threading.Lock()
+        self.wakeup = threading.Event()
+
+    def attach(self, socketio, on_subscribe=None, tickers=None):
+        """
+        Register the subscribe handlers. `on_subscribe(ticker)` runs when a
+        client joins a ticker the hub has no prediction for yet, at most once
+        at a time per ticker, and never again once it returns False.
+        Subscriptions to tickers outside `tickers` are rejected.
+        """
+        self.socketio = socketio
+        self.on_subscribe = on_subscribe
+        self.tickers = set(tickers) if tickers is not None else None
+        socketio.on_event("subscribe", self.subscribe)
+        socketio.on_event("unsubscribe", self.unsubscribe)
+
+    def start(self):
+        # Separate from attach: with pre-forked workers each process starts its own flusher after the fork
+        self.socketio.start_background_task(self.run)
+
+    def has_prediction(self, ticker):
+        with self.lock:
+            return ticker in self.latest and self.latest[ticker]["prediction"] is not None
+
+    def entry(self, store, ticker):
+        if ticker not in store:
+            store[ticker] = {"logs": deque(maxlen=self.max_batch if store is self.pending else SNAPSHOT_LOGS), "prediction": None}
+        return store[ticker]
+
+    def publish_log(self, ticker, content):
+        with self.lock:
+            self.entry(self.pending, ticker)["logs"].append(content)
+            self.entry(self.latest, ticker)["logs"].append(content)
+        self.wakeup.set()
+
+    def publish_prediction(self, ticker, payload):
+        # Only the newest prediction per ticker is worth sending
+        with self.lock:
+            self.entry(self.pending, ticker)["prediction"] = payload
+            self.entry(self.latest, ticker)["prediction"] = payload
+        self.wakeup.set()
+
+    def snapshot(self, ticker):
+        with self.lock:
+            latest = self.latest.get(ticker)
+            if latest is None:
+                return None
+            return self.message(ticker, latest)
+
+    @staticmethod
+    def message(ticker, entry):
+        message = {"ticker": ticker}
+        if entry["logs"]:
+            message["logs"] = list(entry["logs"])
+        if entry["prediction"] is not None:
+            message["prediction"] = entry["prediction"]
+        return message
+
+    def request_prediction(self, ticker):
+        # One on_subscribe task per ticker, however many clients subscribe meanwhile
+        with self.lock:
+            if ticker in self.requested or ticker in self.failed:
+                return
+            if ticker in self.latest and self.latest[ticker]["prediction"] is not None:
+                return
+            self.requested.add(ticker)
+        self.socketio.start_background_task(self.run_on_subscribe, ticker)
+
+    def run_on_subscribe(self, ticker):
+        ok = False
+        try:
+            ok = self.on_subscribe(ticker)
+        finally:
+            with self.lock:
+                self.requested.discard(ticker)
+                if not ok:
+                    self.failed.add(ticker)
+
+    def subscribe(self, data):
+        tickers = requested_tickers(data)
+        if self.tickers is not None:
+            rejected = [ticker for ticker in tickers if ticker not in self.tickers]
+            tickers = [ticker for ticker in tickers if ticker in self.tickers]
+        else:
+            rejected = []
+        for ticker in tickers:
+            join_room(room(ticker))
+            snapshot = self.snapshot(ticker)
+            if snapshot is not None:
+                emit(UPDATE_EVENT, snapshot)
+            if self.on_subscribe is not None:
+                self.request_prediction(ticker)
+        metrics.inc("hub_subscriptions", len(tickers))
+        print(f"Client {request.sid} subscribed to {tickers}")
+        return {"subscribed": tickers, "rejected": rejected}
+
+    def unsubscribe(self, data):
+        tickers = requested_tickers(data)
+        for ticker in tickers:
+            leave_room(room(ticker))
+        return {"unsubscribed": tickers}
+
+    def flush(self):
+        with self.lock:
+            pending, self.pending = self.pending, {}
+        for ticker, entry in pending.items():
+            self.socketio.emit(UPDATE_EVENT, self.message(ticker, entry), to=room(ticker))
+            metrics.inc("hub_messages")
+
+    def run(self):
+        while True:
+            self.wakeup.wait()
+            # Let the burst that woke us accumulate, then send it as one batch
+            self.socketio.sleep(self.interval)
+            self.wakeup.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"Hub flush failed: {e}")
+
+
+hub = Hub()
@@ -0,0 +1,158 @@
+import os
+import math
+import pickle
+from collections import deque
+
+import numpy as np
+
+import feature_store
+
+NAN = float("nan")
+
+ENGINE_VERSION = 2  # bump when the rolling state changes; older pickled engines are rebuilt
+
+INDICATOR_COLUMNS = [
+    "SMA_10",
+    "EMA_10",
+    "ROC_10",
+    "RSI_14",
+    "MACD_12_26_9",
+    "MACDh_12_26_9",
+    "MACDs_12_26_9",
+]
+
+
+class EMA:
+    """
+    pandas-ta `ema`: seeded with the SMA of the first `length` values, then
+    `ewm(span=length, adjust=False)`.
+    """
+
+    def __init__(self, length):
+        self.length = length
+        self.alpha = 2.0 / (length + 1)
+        self.seed = []
+        self.value = NAN
+
+    def update(self, x):
+        if len(self.seed) < self.length:
+            self.seed.append(x)
+            if len(self.seed) == self.length:
+                self.value = sum(self.seed) / self.length
+            return self.value
+        self.value = (1 - self.alpha) * self.value + self.alpha * x
+        return self.value
+
+
+class RMA:
+    """
+    pandas-ta `rma`: `ewm(alpha=1/length, adjust=False)`, starting from the
+    first value with no warm-up period.
+    """
+
+    def __init__(self, length):
+        self.length = length
+        self.alpha = 1.0 / length
+        self.value = NAN
+        self.count = 0
+
+    def update(self, x):
+        self.value = x if self.count == 0 else (1 - self.alpha) * self.value + self.alpha * x
+        self.count += 1
+        return self.value
+
+
+class IncrementalIndicators:
+    """
+    Rolling, O(1)-per-bar version of `dataset.compute_technical_indicators` for one ticker.
+
+    Matches the batch pandas-ta values up to float rounding, except that
+    warm-up bars are NaN instead of being backfilled from future rows.
+    """
+
+    def __init__(self):
+        self.version = ENGINE_VERSION
+        self.closes = deque(maxlen=11)  # SMA_10 window plus the close ROC_10 compares against
+        self.ema = EMA(10)
+        self.fast = EMA(12)
+        self.slow = EMA(26)
+        self.signal = EMA(9)
+        self.gain = RMA(14)
+        self.loss = RMA(14)
+        self.prev_close = None
+
+    def update_close(self, close):
+        """
+        Feed one close and return the indicator values in INDICATOR_COLUMNS order.
+        """
+        self.closes.append(close)
+        n = len(self.closes)
+
+        sma = sum(list(self.closes)[-10:]) / 10 if n >= 10 else NAN
+        ema = self.ema.update(close)
+        roc = 100 * (close - self.closes[0]) / self.closes[0] if n == 11 else NAN
+
+        rsi = NAN
+        if self.prev_close is not None:
+            change = close - self.prev_close
+            gain = self.gain.update(max(change, 0.0))
+            loss = self.loss.update(min(change, 0.0))
+            total = gain + abs(loss)
+            rsi = 100 * gain / total if total else NAN
+        self.prev_close = close
+
+        macd = self.fast.update(close) - self.slow.update(close)
+        signal = self.signal.update(macd) if not math.isnan(macd) else NAN
+        histogram = macd - signal
+
+        return [sma, ema, roc, rsi, macd, histogram, signal]
+
+    def update(self, bar):
+        """
+        Feed one bar (a mapping with at least "Close"; values may be strings)
+        and return it as a dict of floats with the indicator columns added.
+        """
+        row = {}
+        for key, value in bar.items():
+            try:
+                row[key] = float(value)
+            except (TypeError, ValueError):
+                continue
+        row.update(zip(INDICATOR_COLUMNS, self.update_close(row["Close"])))
+        return row
+
+    def feature_row(self, bar, features):
+        """
+        Feed one bar and return a float64 array ordered like `features`.
+        """
+        row = self.update(bar)
+        return np.array([row.get(name, NAN) for name in features], dtype=np.float64)
+
+
+def engine_path(ticker, data_dir="data"):
+    return os.path.join(feature_store.store_dir(ticker, data_dir), "indicators.pkl")
+
+
+def load_engine(ticker, data_dir="data"):
+    """
+    Indicator state as of the last stored bar, replaying stored closes if it
+    was never saved. Closes come from the feature store, or from the CSV for a
+    ticker that has none yet (as in feature_store.load_features).
+    """
+    path = engine_path(ticker, data_dir)
+    if os.path.exists(path):
+        with open(path, "rb") as f:
+            engine = pickle.load(f)
+        if getattr(engine, "version", None) == ENGINE_VERSION:
+            return engine
+
+    values, features, _ = feature_store.load_features(ticker, data_dir)
+    engine = IncrementalIndicators()
+    for close in values[:, features.index("Close")].tolist():
+        engine.update_close(close)
+    return engine
+
+
+def save_engine(engine, ticker, data_dir="data"):
+    with open(engine_path(ticker, data_dir), "wb") as f:
+        pickle.dump(engine, f)
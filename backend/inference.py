@@ -0,0 +1,110 @@
+import os
+import numpy as np
+import torch
+
+from artifacts import checkpoint_path
+from registry import registry, device
+from metrics import metrics
+
+# eager, torchscript or onnx; see export.py
+INFERENCE_BACKEND = os.getenv("INFERENCE_BACKEND", "eager")
+DEFAULT_SEQ_LENGTH = 300  # for checkpoints that don't record their training window
+
+
+def rollout(model, windows, steps_ahead, ticker_ids=None):
+    """
+    Rollout over a batch of scaled windows.
+
+    `windows` is a (batch, seq_length, features) tensor on the model's device.
+    A multi-horizon model (output_dim = H) predicts H steps per forward pass,
+    so up to H steps take a single pass. Beyond that, and for next-step models,
+    the predicted targets are fed back in as the newest rows, with every
+    other feature copied from the last known row. Returns a
+    (batch, steps_ahead) array of scaled predictions. `ticker_ids` is the
+    (batch,) id tensor for shared multi-ticker models.
+
+    The window and the predictions live in buffers allocated once on the
+    device: each pass reads a sliding view of the buffer, writes its output in
+    place and the results are copied to the host a single time at the end.
+    """
+    batch, seq_length, n_features = windows.shape
+    buffer = torch.empty((batch, seq_length + steps_ahead, n_features), dtype=windows.dtype, device=windows.device)
+    buffer[:, :seq_length] = windows
+    predictions = torch.empty((batch, steps_ahead), dtype=windows.dtype, device=windows.device)
+    extra = () if ticker_ids is None else (ticker_ids,)
+
+    with torch.inference_mode():
+        step = 0
+        while step < steps_ahead:
+            output = model(buffer[:, step:step + seq_length], *extra)
+            k = min(output.shape[1], steps_ahead - step)
+            predictions[:, step:step + k] = output[:, :k]
+
+            # Append the predicted values as new rows, other features held at the last row
+            end = seq_length + step
+            buffer[:, end:end + k] = buffer[:, end - 1:end]
+            buffer[:, end:end + k, 0] = output[:, :k]
+            step += k
+
+    return predictions.cpu().numpy()
+
+
+def inverse_target(scaler, values, n_features):
+    dummy_array = np.zeros((len(values), n_features))
+    dummy_array[:, 0] = values
+    return scaler.inverse_transform(dummy_array)[:, 0]
+
+
+def predict_batch(requests, seq_length=None, model_dir="models", data_dir="data", backend=None):
+    """
+    Run many predictions with one CTTS forward pass per rollout pass (one
+    per step, or per H steps for a multi-horizon checkpoint).
+
+    Parameters:
+    - requests: list of (ticker, window, steps_ahead). `window` is a scaled
+      (seq_length, features) array, or None to use the latest rows on disk.
+    - seq_length: window length used when `window` is None; defaults to the
+      checkpoint's training window
+    - backend: "eager", "torchscript" or "onnx" (default INFERENCE_BACKEND)
+
+    Requests sharing a checkpoint, input_dim and window length are stacked into
+    a single batch; with a shared model that is every ticker at once. Returns a list of unscaled price arrays in request order,
+    with None for requests that failed.
+    """
+    backend = backend or INFERENCE_BACKEND
+    results = [None] * len(requests)
+    groups = {}  # {(model_path, input_dim, window_length): [(index, window, steps, scaler, ticker_id)]}
+
+    for i, (ticker, window, steps_ahead) in enumerate(requests):
+        model_path = checkpoint_path(ticker, model_dir)
+        try:
+            length = len(window) if window is not None else (seq_length or registry.get_artifact(model_path).seq_length or DEFAULT_SEQ_LENGTH)
+            _, values, scaler, features = registry.get(ticker, model_path, data_dir, backend, length)
+            if window is None:
+                if len(values) < length:
+                    raise ValueError("Not enough data to form a prediction window.")
+                # Only the tail is read from the memory-mapped store
+                with metrics.span("scale"):
+                    window = scaler.transform(values[-length:])
+            key = (model_path, len(features), len(window))
+            ticker_id = registry.get_artifact(model_path).ticker_id(ticker)
+            groups.setdefault(key, []).append((i, window, steps_ahead, scaler, ticker_id))
+        except Exception as e:
+            print(f" Future prediction failed for {ticker}: {e}")
+
+    for (model_path, input_dim, length), members in groups.items():
+        try:
+            model = registry.get_model(model_path, input_dim, backend, length)
+            windows = torch.tensor(np.stack([m[1] for m in members]), dtype=torch.float32).to(device)
+            max_steps = max(m[2] for m in members)
+            ticker_ids = None if members[0][4] is None else torch.tensor([m[4] for m in members], device=device)
+            with metrics.span("forward"):
+                predictions = rollout(model, windows, max_steps, ticker_ids)
+
+            for row, (i, _, steps_ahead, scaler, _) in enumerate(members):
+                results[i] = inverse_target(scaler, predictions[row, :steps_ahead], input_dim)
+        except Exception as e:
+            for i, *_ in members:
+                print(f" Future prediction failed for {requests[i][0]}: {e}")
+
+    return results
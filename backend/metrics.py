@@ -0,0 +1,224 @@
+import os
+import sys
+import time
+import bisect
+import threading
+import contextlib
+import functools
+from collections import Counter
+
+PREFIX = "ctts"
+# Latency buckets in seconds: 0.5ms .. 30s, enough for a forward pass up to an LLM call
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+PROFILE_INTERVAL = 0.005  # seconds between profiler samples
+PROFILE_DEPTH = 32  # frames kept per sampled stack
+
+# Spans recorded across the backend, for reference:
+#   load_data, load_artifact, load_model   registry cache misses
+#   scale, forward                         inference.predict_batch
+#   simulate                               try_run trading simulations
+#   llm                                    one explanation backend request
+#   tick_features, tick_decide             socket_handler pipeline stages
+#   request_predict                        the /predict route
+
+
+class Shard:
+    """
+    One thread's histograms and counters. Only the owning thread writes to
+    it, so recording takes no lock; scrapes read all shards and sum them.
+    """
+
+    def __init__(self):
+        self.thread = threading.current_thread()
+        self.histograms = {}  # {span: [bucket counts..., +Inf count, sum]}
+        self.counters = {}
+
+    def observe(self, name, seconds):
+        histogram = self.histograms.get(name)
+        if histogram is None:
+            histogram = self.histograms[name] = [0] * (len(BUCKETS) + 1) + [0.0]
+        histogram[bisect.bisect_left(BUCKETS, seconds)] += 1
+        histogram[-1] += seconds
+
+    def inc(self, name, value=1):
+        self.counters[name] = self.counters.get(name, 0) + value
+
+    def merge_into(self, histograms, counters):
+        # Copies first: the owning thread may add a span or counter while we read
+        for name, histogram in list(self.histograms.items()):
+            total = histograms.setdefault(name, [0] * (len(BUCKETS) + 1) + [0.0])
+            for i, value in enumerate(list(histogram)):
+                total[i] += value
+        for name, value in list(self.counters.items()):
+            counters[name] = counters.get(name, 0) + value
+
+
+class Metrics:
+    def __init__(self):
+        self.local = threading.local()
+        self.shards = []  # list.append is atomic, so registering needs no lock either
+        self.retired = Shard()  # totals from threads that have exited
+        self.gauges = {}  # {name: (fn, help)}
+        self.scrape_lock = threading.Lock()
+
+    def shard(self):
+        shard = getattr(self.local, "shard", None)
+        if shard is None:
+            shard = self.local.shard = Shard()
+            self.shards.append(shard)
+        return shard
+
+    def observe(self, name, seconds):
+        self.shard().observe(name, seconds)
+
+    def inc(self, name, value=1):
+        self.shard().inc(name, value)
+
+    def gauge(self, name, fn, help=""):
+        """
+        Register a callable read at scrape time, e.g. a queue depth.
+        """
+        self.gauges[name] = (fn, help)
+
+    @contextlib.contextmanager
+    def span(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start)
+
+    def timed(self, name):
+        """
+        Decorator form of span.
+        """
+        def decorator(fn):
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                with self.span(name):
+                    return fn(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def snapshot(self):
+        """
+        Return ({span: [bucket counts..., +Inf count, sum]}, {counter: value}) summed over all threads.
+        """
+        with self.scrape_lock:
+            # Fold shards of finished threads into the retired totals, so
+            # per-request threads don't accumulate forever
+            alive = []
+            for shard in list(self.shards):
+                if shard.thread.is_alive():
+                    alive.append(shard)
+                else:
+                    shard.merge_into(self.retired.histograms, self.retired.counters)
+                    self.shards.remove(shard)  # new threads may be appending meanwhile
+
+            histograms, counters = {}, {}
+            self.retired.merge_into(histograms, counters)
+            for shard in alive:
+                shard.merge_into(histograms, counters)
+        return histograms, counters
+
+    def render(self):
+        """
+        Prometheus text exposition format (version 0.0.4).
+        """
+        histograms, counters = self.snapshot()
+        lines = [
+            f"# HELP {PREFIX}_span_seconds Time spent in instrumented sections.",
+            f"# TYPE {PREFIX}_span_seconds histogram",
+        ]
+        for name in sorted(histograms):
+            histogram = histograms[name]
+            cumulative = 0
+            for bound, count in zip(BUCKETS + ("+Inf",), histogram[:-1]):
+                cumulative += count
+                lines.append(f'{PREFIX}_span_seconds_bucket{{span="{name}",le="{bound}"}} {cumulative}')
+            lines.append(f'{PREFIX}_span_seconds_sum{{span="{name}"}} {histogram[-1]:.6f}')
+            lines.append(f'{PREFIX}_span_seconds_count{{span="{name}"}} {cumulative}')
+
+        for name in sorted(counters):
+            lines.append(f"# TYPE {PREFIX}_{name}_total counter")
+            lines.append(f"{PREFIX}_{name}_total {counters[name]}")
+
+        for name, (fn, help) in sorted(self.gauges.items()):
+            try:
+                value = fn()
+            except Exception:
+                continue
+            if help:
+                lines.append(f"# HELP {PREFIX}_{name} {help}")
+            lines.append(f"# TYPE {PREFIX}_{name} gauge")
+            lines.append(f"{PREFIX}_{name} {value}")
+        return "\n".join(lines) + "\n"
+
+
+class SamplingProfiler:
+    """
+    Opt-in wall-clock profiler: a background thread samples every thread's
+    stack each `interval` seconds. `report()` returns collapsed stacks
+    ("frame;frame;frame count" per line), the input format of flamegraph.pl
+    and speedscope. Costs nothing while stopped.
+    """
+
+    def __init__(self, interval=PROFILE_INTERVAL, depth=PROFILE_DEPTH):
+        self.interval = interval
+        self.depth = depth
+        self.samples = Counter()
+        self.lock = threading.Lock()
+        self.thread = None
+        self.running = threading.Event()
+        self.started = None
+
+    @property
+    def active(self):
+        return self.running.is_set()
+
+    def start(self):
+        if self.active:
+            return
+        with self.lock:
+            self.samples.clear()
+        self.started = time.time()
+        self.running.set()
+        self.thread = threading.Thread(target=self.run, name="sampling-profiler", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.running.clear()
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+
+    def run(self):
+        me = threading.get_ident()
+        names = {}
+        while self.running.is_set():
+            for thread in threading.enumerate():
+                names[thread.ident] = thread.name
+            for ident, frame in sys._current_frames().items():
+                if ident == me:
+                    continue
+                stack = []
+                while frame is not None and len(stack) < self.depth:
+                    code = frame.f_code
+                    stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                    frame = frame.f_back
+                stack.append(names.get(ident, str(ident)))
+                with self.lock:
+                    self.samples[";".join(reversed(stack))] += 1
+            time.sleep(self.interval)
+
+    def report(self, limit=None):
+        with self.lock:
+            samples = self.samples.most_common(limit)
+        return "\n".join(f"{stack} {count}" for stack, count in samples) + "\n"
+
+
+metrics = Metrics()
+profiler = SamplingProfiler()
+
+if os.getenv("METRICS_PROFILE") == "1":
+    profiler.start()
@@ -2,9 +2,34 @@ import torch
 import torch.nn as nn
 import torch.nn.functional as F
 
+ATTENTION_MODES = ("full", "local")
+
 class CTTS(nn.Module):
-    def __init__(self, input_dim, cnn_channels=64, num_heads=4, transformer_layers=2, hidden_dim=128, output_dim=1):
+    """
+    attention:
+    - "full": every pooled token attends to every other (batch_first, so the
+      encoder uses scaled_dot_product_attention and the fused inference path)
+    - "local": tokens attend within blocks of `window` tokens, shifted by half
+      a block on every other layer so information still crosses blocks;
+      cost grows linearly with the sequence instead of quadratically
+    token_stride: extra average pooling over tokens before the transformer
+    num_tickers: when > 0, one model serves many tickers; a learned ticker
+      embedding is added to every token and forward takes the ticker ids
+    output_dim: forecast horizon; the model predicts the next `output_dim`
+      scaled closes in one forward pass (1 = next step only)
+
+    The parameters are the same in every mode, so checkpoints move between
+    modes (see artifacts.convert_checkpoint).
+    """
+    def __init__(self, input_dim, cnn_channels=64, num_heads=4, transformer_layers=2, hidden_dim=128, output_dim=1,
+                 attention="full", window=64, token_stride=1, num_tickers=0):
         super(CTTS, self).__init__()
+        if attention not in ATTENTION_MODES:
+            raise ValueError(f"Unknown attention mode {attention!r}; expected one of {ATTENTION_MODES}")
+        self.attention = attention
+        self.window = window
+        self.token_stride = token_stride
+        self.num_tickers = num_tickers
 
         # CNN feature extractor
         self.conv1 = nn.Conv1d(in_channels=input_dim, out_channels=cnn_channels, kernel_size=3, padding=1)
@@ -14,27 +39,60 @@ class CTTS(nn.Module):
         self.pool = nn.MaxPool1d(kernel_size=2)
 
         # Transformer encoder
-        encoder_layer = nn.TransformerEncoderLayer(d_model=cnn_channels, nhead=num_heads, dim_feedforward=hidden_dim)
-        self.transformer = nn.TransformerEncoder(encoder_layer, num_layers=transformer_layers)
+        encoder_layer = nn.TransformerEncoderLayer(d_model=cnn_channels, nhead=num_heads, dim_feedforward=hidden_dim, batch_first=True)
+        self.transformer = nn.TransformerEncoder(encoder_layer, num_layers=transformer_layers, enable_nested_tensor=False)
+        self.ticker_embedding = nn.Embedding(num_tickers, cnn_channels) if num_tickers else None
 
         # Fully connected output layer
         self.fc1 = nn.Linear(cnn_channels, hidden_dim)
         self.fc2 = nn.Linear(hidden_dim, output_dim)
 
-    def forward(self, x):
-        # CNN feature extraction
+    def local_transformer(self, x):
+        batch, tokens, channels = x.shape
+        for i, layer in enumerate(self.transformer.layers):
+            shift = self.window // 2 if i % 2 else 0
+            pad_end = (-(shift + tokens)) % self.window
+            blocks = (shift + tokens + pad_end) // self.window
+
+            # Fold the blocks into the batch dimension; padding is masked out as keys
+            padded = F.pad(x, (0, 0, shift, pad_end)).reshape(batch * blocks, self.window, channels)
+            mask = torch.ones(shift + tokens + pad_end, dtype=torch.bool, device=x.device)
+            mask[shift:shift + tokens] = False
+            mask = mask.reshape(1, blocks, self.window).expand(batch, -1, -1).reshape(batch * blocks, self.window)
+
+            x = layer(padded, src_key_padding_mask=mask).reshape(batch, -1, channels)[:, shift:shift + tokens]
+        return x
+
+    def encode(self, x):
+        # CNN feature extraction, (batch, sequence_length, features) -> (batch, channels, sequence_length)
         x = x.permute(0, 2, 1)  # Change shape for Conv1D (batch, features, sequence_length)
         x = F.relu(self.bn1(self.conv1(x)))
         x = F.relu(self.bn2(self.conv2(x)))
+        return x
+
+    def head(self, x, ticker_ids=None):
+        # Pooling, transformer and output layers on top of `encode`
         x = self.pool(x)
+        if self.token_stride > 1:
+            x = F.avg_pool1d(x, self.token_stride)
 
         # Transformer
-        x = x.permute(2, 0, 1)  # Change shape for Transformer (sequence_length, batch, features)
-        x = self.transformer(x)
-        x = x.mean(dim=0)  # Aggregate features
+        x = x.permute(0, 2, 1)  # Change shape for Transformer (batch, sequence_length, features)
+        if self.ticker_embedding is not None:
+            if ticker_ids is None:
+                raise ValueError("This CTTS is shared across tickers; pass ticker_ids")
+            x = x + self.ticker_embedding(ticker_ids).unsqueeze(1)
+        if self.attention == "local" and x.shape[1] > self.window:
+            x = self.local_transformer(x)
+        else:
+            x = self.transformer(x)
+        x = x.mean(dim=1)  # Aggregate features
 
         # Fully connected layers
         x = F.relu(self.fc1(x))
         x = self.fc2(x)
 
-        return x
\ No newline at end of file
+        return x
+
+    def forward(self, x, ticker_ids=None):
+        return self.head(self.encode(x), ticker_ids)
\ No newline at end of file
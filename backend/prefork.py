@@ -0,0 +1,95 @@
+import os
+import gc
+import signal
+import socket
+import time
+
+import torch
+from werkzeug.serving import make_server
+
+RESTART_DELAY = 1.0  # seconds; keeps a worker that dies on startup from spinning
+
+# Pre-fork serving: the parent loads models and feature stores once, then
+# forks workers that all accept on one listening socket. Everything loaded
+# before the fork is shared with the workers:
+#   - model weights are moved to shared memory (registry.share_memory)
+#   - feature matrices are np.memmap views of the feature store, so they live
+#     in the page cache once for all processes
+#   - gc.freeze() moves the parent's objects out of the collector's reach, so
+#     collections in the workers don't write to (and copy) their pages
+
+
+def worker_threads(workers):
+    # Split the cores between workers so their intra-op pools don't oversubscribe
+    return max(1, (os.cpu_count() or 1) // workers)
+
+
+def listen(host, port, backlog=128):
+    sock = socket.create_server((host, port), backlog=backlog)
+    sock.set_inheritable(True)
+    return sock
+
+
+def run_worker(app, sock, index, threads, on_start=None):
+    torch.set_num_threads(threads)
+    if on_start is not None:
+        on_start(index)
+    server = make_server(sock.getsockname()[0], sock.getsockname()[1], app, threaded=True, fd=sock.fileno())
+    print(f"Worker {index} (pid {os.getpid()}) serving with {threads} torch thread(s)")
+    server.serve_forever()
+
+
+def serve(app, workers, host="127.0.0.1", port=5000, on_start=None):
+    """
+    Fork `workers` processes serving `app` on host:port and supervise them,
+    restarting any that exit. `on_start(index)` runs in each worker before it
+    starts accepting, e.g. to start background threads (threads don't
+    survive a fork, so none should be started in the parent).
+
+    Each worker is a threaded WSGI server; the kernel spreads connections
+    across the workers.
+    """
+    sock = listen(host, port)
+    threads = worker_threads(workers)
+
+    gc.collect()
+    gc.freeze()
+
+    children = {}
+
+    def spawn(index):
+        pid = os.fork()
+        if pid == 0:
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            signal.signal(signal.SIGINT, signal.SIG_DFL)
+            code = 0
+            try:
+                run_worker(app, sock, index, threads, on_start)
+            except BaseException as e:
+                print(f"Worker {index} stopped: {e!r}")
+                code = 1
+            finally:
+                os._exit(code)
+        children[pid] = index
+
+    def shutdown(signum, frame):
+        for pid in list(children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+        raise SystemExit(0)
+
+    for index in range(workers):
+        spawn(index)
+    print(f"🚀 Serving on http://{host}:{port} with {workers} workers")
+
+    signal.signal(signal.SIGTERM, shutdown)
+    signal.signal(signal.SIGINT, shutdown)
+    while True:
+        pid, status = os.wait()
+        index = children.pop(pid, None)
+        if index is not None:
+            print(f"Worker {index} (pid {pid}) exited with status {os.waitstatus_to_exitcode(status)}; restarting")
+            time.sleep(RESTART_DELAY)
+            spawn(index)
@@ -0,0 +1,181 @@
+import os
+import threading
+from collections import OrderedDict
+
+import torch
+
+import feature_store
+from artifacts import load_artifact, checkpoint_path
+from export import load_backend, OnnxModel
+from metrics import metrics
+
+device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+
+MAX_MODELS = 8
+MAX_DATASETS = 16
+
+
+class ModelRegistry:
+    """
+    Process-wide cache of CTTS checkpoints and ticker feature data.
+
+    Entries are evicted least-recently-used once the cache is full and are
+    reloaded when the file on disk has a newer mtime than the cached copy.
+    """
+
+    def __init__(self, max_models=MAX_MODELS, max_datasets=MAX_DATASETS):
+        self.max_models = max_models
+        self.max_datasets = max_datasets
+        self._models = OrderedDict()  # {(path, input_dim, backend, trace length): (mtime, model)}
+        self._artifacts = OrderedDict()  # {path: (mtime, ModelArtifact)}
+        self._datasets = OrderedDict()  # {(ticker, data_dir[, columns]): (mtime, data or reordered values)}
+        self._lock = threading.RLock()
+
+    def _lookup(self, cache, key, mtime):
+        entry = cache.get(key)
+        if entry is None or entry[0] != mtime:
+            metrics.inc("registry_misses")
+            return None
+        cache.move_to_end(key)
+        metrics.inc("registry_hits")
+        return entry[1]
+
+    def _store(self, cache, key, mtime, value, limit):
+        cache[key] = (mtime, value)
+        cache.move_to_end(key)
+        while len(cache) > limit:
+            cache.popitem(last=False)
+
+    def get_data(self, ticker, data_dir="data"):
+        """
+        Return (values, scaler, features) for a ticker.
+
+        `values` is the unscaled feature matrix, memory-mapped from the feature
+        store when available; scale the rows you need with `scaler.transform`.
+        """
+        key = (ticker, data_dir)
+        mtime = os.stat(feature_store.version_path(ticker, data_dir)).st_mtime_ns
+        with self._lock:
+            cached = self._lookup(self._datasets, key, mtime)
+            if cached is not None:
+                return cached
+
+            with metrics.span("load_data"):
+                values, features, scaler = feature_store.load_features(ticker, data_dir)
+
+            value = (values, scaler, features)
+            self._store(self._datasets, key, mtime, value, self.max_datasets)
+            return value
+
+    def get_columns(self, ticker, columns, data_dir="data"):
+        """
+        Return the ticker's unscaled values with columns in `columns` order.
+
+        The stored matrix is returned as is when the order already matches;
+        otherwise the reordered copy is made once per data version and cached
+        like the data itself.
+        """
+        values, _, features = self.get_data(ticker, data_dir)
+        if list(columns) == features:
+            return values
+
+        key = (ticker, data_dir, tuple(columns))
+        mtime = os.stat(feature_store.version_path(ticker, data_dir)).st_mtime_ns
+        with self._lock:
+            cached = self._lookup(self._datasets, key, mtime)
+            if cached is not None:
+                return cached
+            reordered = values[:, [features.index(name) for name in columns]]
+            self._store(self._datasets, key, mtime, reordered, self.max_datasets)
+            return reordered
+
+    def get_artifact(self, path):
+        """
+        Return the ModelArtifact at `path` (weights memory-mapped, scaler and
+        feature list as saved at training time).
+        """
+        mtime = os.stat(path).st_mtime_ns
+        with self._lock:
+            cached = self._lookup(self._artifacts, path, mtime)
+            if cached is not None:
+                return cached
+
+            with metrics.span("load_artifact"):
+                artifact = load_artifact(path)
+            self._store(self._artifacts, path, mtime, artifact, self.max_models)
+            return artifact
+
+    def get_model(self, path, input_dim, backend="eager", seq_length=100):
+        """
+        Return an eval-mode CTTS loaded from `path`, run by `backend`
+        ("eager", "torchscript" or "onnx"; see export.load_backend).
+        TorchScript models are traced for, and cached per, `seq_length`.
+        """
+        mtime = os.stat(path).st_mtime_ns
+        key = (path, input_dim, backend, seq_length if backend == "torchscript" else None)
+        with self._lock:
+            cached = self._lookup(self._models, key, mtime)
+            if cached is not None:
+                return cached
+
+            with metrics.span("load_model"):
+                if backend == "eager":
+                    artifact = self.get_artifact(path)
+                    if artifact.input_dim != input_dim:
+                        raise ValueError(f"{path} expects {artifact.input_dim} features, got {input_dim}")
+                    model = artifact.build_model(device)
+                else:
+                    model = load_backend(path, input_dim, backend, device, seq_length)
+
+            self._store(self._models, key, mtime, model, self.max_models)
+            return model
+
+    def get(self, ticker, model_path, data_dir="data", backend="eager", seq_length=100):
+        """
+        Return (model, values, scaler, features) for a ticker.
+
+        The scaler and feature order come from the checkpoint when it carries
+        them (the ticker's own scaler for shared models), so predictions don't
+        drift as the data grows; `values` columns follow that order (see
+        get_columns).
+        """
+        values, scaler, features = self.get_data(ticker, data_dir)
+        artifact = self.get_artifact(model_path)
+        if artifact.features is not None:
+            values = self.get_columns(ticker, artifact.features, data_dir)
+            scaler, features = artifact.scaler_for(ticker), artifact.features
+        model = self.get_model(model_path, input_dim=len(features), backend=backend, seq_length=seq_length)
+        return model, values, scaler, features
+
+    def warm(self, tickers, model_dir="models", data_dir="data", backend="eager", seq_length=100):
+        """
+        Load every ticker up front so the first request doesn't pay for it.
+        TorchScript and ONNX graphs for `seq_length` are exported here too.
+        """
+        for ticker in tickers:
+            try:
+                model = self.get(ticker, checkpoint_path(ticker, model_dir), data_dir, backend, seq_length)[0]
+                if isinstance(model, OnnxModel):
+                    model.export(seq_length)  # sessions are opened lazily, per process
+                print(f"Warmed model registry for {ticker}")
+            except Exception as e:
+                print(f"Could not warm registry for {ticker}: {e}")
+
+    def share_memory(self):
+        """
+        Move the weights of every cached torch model to shared memory, so
+        processes forked afterwards all use the one copy.
+        """
+        with self._lock:
+            for _, model in self._models.values():
+                if isinstance(model, torch.nn.Module):
+                    model.share_memory()
+
+    def clear(self):
+        with self._lock:
+            self._models.clear()
+            self._artifacts.clear()
+            self._datasets.clear()
+
+
+registry = ModelRegistry()
@@ -0,0 +1,118 @@
+import os
+import threading
+from collections import OrderedDict
+
+import feature_store
+from artifacts import checkpoint_path
+from metrics import metrics
+
+MAX_RESPONSES = 64
+
+
+def file_version(path):
+    try:
+        return os.stat(path).st_mtime_ns
+    except FileNotFoundError:
+        return None
+
+
+def prediction_version(ticker, model_dir="models", data_dir="data"):
+    """
+    (data version, model version) for a ticker. Both are file mtimes: the
+    feature store's meta.json is rewritten whenever bars are ingested, and
+    artifacts are swapped in atomically, so either changing means new results.
+    """
+    return (file_version(feature_store.version_path(ticker, data_dir)),
+            file_version(checkpoint_path(ticker, model_dir)))
+
+
+class Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Runs at most one call per key at a time; concurrent callers with the same
+    key wait for that call and share its result (or exception).
+    """
+
+    def __init__(self):
+        self.calls = {}
+        self.lock = threading.Lock()
+
+    def do(self, key, fn):
+        with self.lock:
+            call = self.calls.get(key)
+            leader = call is None
+            if leader:
+                call = self.calls[key] = Call()
+
+        if not leader:
+            metrics.inc("predict_coalesced")
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+            return call.result
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self.lock:
+                del self.calls[key]
+            call.done.set()
+
+
+class ResponseCache:
+    """
+    LRU cache of finished responses keyed by request plus version, with
+    single-flight computation of misses. A stale version is never returned:
+    it misses, gets recomputed and replaces the old entry for that request.
+    """
+
+    def __init__(self, max_entries=MAX_RESPONSES):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()  # {request key: (version, value)}
+        self.flight = SingleFlight()
+        self.lock = threading.Lock()
+
+    def get(self, key, version):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None or entry[0] != version:
+                return None
+            self.entries.move_to_end(key)
+            return entry[1]
+
+    def put(self, key, version, value):
+        with self.lock:
+            self.entries[key] = (version, value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def get_or_compute(self, key, version, fn):
+        value = self.get(key, version)
+        if value is not None:
+            metrics.inc("predict_cache_hits")
+            return value
+
+        def compute():
+            # A caller that raced the previous flight may find it already cached
+            value = self.get(key, version)
+            if value is None:
+                metrics.inc("predict_cache_misses")
+                value = fn()
+                self.put(key, version, value)
+            return value
+
+        return self.flight.do((key, version), compute)
+
+
+responses = ResponseCache()
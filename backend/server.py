@@ -1,51 +1,209 @@
-from flask import Flask, jsonify
+from flask import Flask, Response, jsonify, request
 from flask_cors import CORS
 from flask_socketio import SocketIO, emit
 from socket_handler import start_socket_client
 from try_run import predict_price, simulate_trading_with_gemini
+from registry import registry
+from artifacts import checkpoint_path
+from inference import DEFAULT_SEQ_LENGTH, INFERENCE_BACKEND
+from response_cache import responses, prediction_version
+from hub import hub
+from metrics import metrics, profiler
+import os
 import json
+import argparse
 import threading
-import pandas as pd
+import feature_store
+import prefork
 
 app = Flask(__name__)
 
 # ✅ Only allow localhost:3000 to access your Flask endpoints
 CORS(app, origins=["http://localhost:3000"])
 
-# ✅ Allow WebSocket CORS for the same origin
-socketio = SocketIO(app, cors_allowed_origins=["http://localhost:3000"])
+# ✅ Allow WebSocket CORS for the same origin; one thread per request, so a
+# slow /predict doesn't hold up the others. With several server processes, set
+# SOCKETIO_MESSAGE_QUEUE (e.g. redis://) so broadcasts reach every process.
+socketio = SocketIO(app, cors_allowed_origins=["http://localhost:3000"], async_mode="threading",
+                    message_queue=os.getenv("SOCKETIO_MESSAGE_QUEUE"))
 
 latest_stock_data = {}
+TICKERS = ["RELIANCE.NS", "INFY.NS", "ITC.NS"]
+MAX_STEPS = 500  # closes per /predict; the rollout and backtest grow with it
+MIN_SEQ_LENGTH = 8
+
+
+class InvalidRequest(ValueError):
+    pass
+
+
+def int_arg(name, default):
+    # Unlike request.args.get(type=int), a malformed value is an error rather than the default
+    raw = request.args.get(name)
+    if raw is None:
+        return default
+    try:
+        return int(raw)
+    except ValueError:
+        raise InvalidRequest(f"{name} must be an integer, got {raw!r}")
+
+
+def validate_prediction(ticker, steps, seq_length):
+    # Before anything touches data/ or models/ paths built from the ticker
+    if ticker not in TICKERS:
+        raise InvalidRequest(f"Unknown ticker {ticker!r}; expected one of {TICKERS}")
+    if not 1 <= steps <= MAX_STEPS:
+        raise InvalidRequest(f"steps must be between 1 and {MAX_STEPS}, got {steps}")
+    window = registry.get_artifact(checkpoint_path(ticker)).seq_length or DEFAULT_SEQ_LENGTH
+    if not MIN_SEQ_LENGTH <= seq_length <= window:
+        raise InvalidRequest(f"seq_length must be between {MIN_SEQ_LENGTH} and the model's window of {window}, got {seq_length}")
+
+def compute_prediction(ticker, steps, seq_length):
+    pred = predict_price(ticker=ticker, steps_ahead=steps, seq_length=seq_length)
+    if pred is None:
+        raise ValueError(f"Prediction failed for {ticker}")
+    values, _, features = registry.get_data(ticker)
+    actual = values[::steps, features.index('Close')].tolist()
+
+    stock_data = {ticker: (actual, pred.tolist())}
+    final_balance, profit, log = simulate_trading_with_gemini(stock_data)
+
+    payload = {
+        "Final Balance": final_balance,
+        "Total Profit": profit,
+        "Trade Log": log
+    }
+    # Computed once, pushed to every subscribed dashboard
+    hub.publish_prediction(ticker, dict(payload, steps=steps, seq_length=seq_length))
+    # Cached serialized, so repeat hits skip JSON encoding too
+    return jsonify(payload).get_data()
+
+
+def predict_for_subscribers(ticker, steps=50, seq_length=100):
+    # Shares the /predict cache and single-flight, so a wave of new subscribers costs one computation
+    try:
+        with app.app_context():
+            body = responses.get_or_compute((ticker, steps, seq_length), prediction_version(ticker),
+                                            lambda: compute_prediction(ticker, steps, seq_length))
+        if not hub.has_prediction(ticker):
+            # Served from the cache, so compute_prediction didn't publish it
+            hub.publish_prediction(ticker, dict(json.loads(body), steps=steps, seq_length=seq_length))
+        return True
+    except Exception as e:
+        print(f"Prediction for subscribers of {ticker} failed: {e}")
+        return False
+
 
 @app.route("/predict", methods=["GET"])
+@metrics.timed("request_predict")
 def serve_prediction():
     global latest_stock_data
 
     try:
-        ticker = latest_stock_data.get("ticker", "RELIANCE.NS")
-        steps = latest_stock_data.get("steps", 50)
-
-        pred = predict_price(ticker=ticker, steps_ahead=steps, seq_length=100)
-        data = pd.read_csv(f"data/Data_{ticker}.csv")
-        data.drop(columns=['Date'], inplace=True)
-        actual = data['Close'].values.tolist()[::steps]
+        ticker = request.args.get("ticker", latest_stock_data.get("ticker", "RELIANCE.NS"))
+        steps = int_arg("steps", latest_stock_data.get("steps", 50))
+        seq_length = int_arg("seq_length", 100)
+        validate_prediction(ticker, steps, seq_length)
 
-        stock_data = {ticker: (actual, pred.tolist())}
-        final_balance, profit, log = simulate_trading_with_gemini(stock_data)
-
-        return jsonify({
-            "Final Balance": final_balance,
-            "Total Profit": profit,
-            "Trade Log": log
-        })
+        # Identical requests share one computation, and the result is reused
+        # until the ticker's data or model file changes
+        body = responses.get_or_compute((ticker, steps, seq_length), prediction_version(ticker),
+                                        lambda: compute_prediction(ticker, steps, seq_length))
+        return Response(body, mimetype="application/json")
 
+    except InvalidRequest as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
+        metrics.inc("predict_errors")
         return jsonify({"error": str(e)}), 500
 
+
+@app.route("/metrics", methods=["GET"])
+def serve_metrics():
+    # Prometheus scrape endpoint
+    return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
+
+
+@app.route("/profile", methods=["GET", "POST"])
+def serve_profile():
+    """
+    Sampling profiler (off unless METRICS_PROFILE=1): POST ?enabled=1 starts a
+    fresh profile, ?enabled=0 stops it; GET returns collapsed stacks for
+    flamegraph.pl or speedscope. POST is refused unless METRICS_PROFILE is
+    set (any value; "1" also starts profiling at boot).
+    """
+    if request.method == "POST":
+        if not os.getenv("METRICS_PROFILE"):
+            return jsonify({"error": "Profiler control is disabled; set METRICS_PROFILE to enable it"}), 403
+        if request.args.get("enabled", "1") == "1":
+            profiler.start()
+        else:
+            profiler.stop()
+        return jsonify({"active": profiler.active, "started": profiler.started})
+    return Response(profiler.report(), mimetype="text/plain")
+
+hub.attach(socketio, on_subscribe=predict_for_subscribers, tickers=TICKERS)
+
+
+def prepare_shared(tickers):
+    """
+    Load everything workers will share before forking: feature stores (built
+    from the CSV where missing, so workers memory-map rather than parse it)
+    and the models, moved to shared memory.
+    """
+    for ticker in tickers:
+        if not feature_store.store_exists(ticker) and os.path.exists(feature_store.csv_path(ticker)):
+            feature_store.build_store_from_csv(ticker)
+    # Eager models serve the tick stream whatever the backend
+    registry.warm(tickers)
+    if INFERENCE_BACKEND != "eager":
+        # Export TorchScript/ONNX graphs once here, rather than in every worker on its first request
+        registry.warm(tickers, backend=INFERENCE_BACKEND)
+    registry.share_memory()
+
+
+def start_worker(index):
+    hub.start()
+    # One tick feed per deployment, not per worker
+    if index == 0:
+        threading.Thread(target=start_socket_client, daemon=True).start()
+
+
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve predictions over HTTP and SocketIO.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=5000)
+    # With --workers > 1 only the models and feature stores loaded before the
+    # fork are shared; everything else is per worker process:
+    #   - /metrics and /profile describe the worker that happened to accept
+    #     the scrape, so scrape or aggregate every worker for totals
+    #   - the /predict response cache and single-flight, and ONNX sessions
+    #   - SocketIO sessions, so clients must use the websocket transport
+    #     (no long-polling)
+    #   - the tick feed, which only worker 0 runs: its trade logs reach
+    #     dashboards on other workers through SOCKETIO_MESSAGE_QUEUE, which is
+    #     therefore required, and a new subscriber's snapshot holds only what
+    #     its own worker has published
+    parser.add_argument("--workers", type=int, default=int(os.getenv("SERVER_WORKERS", "1")),
+                        help="Pre-forked worker processes sharing models and features (POSIX only); "
+                             "metrics, profiles and caches are per worker")
+    args = parser.parse_args()
+    if args.workers > 1 and not os.getenv("SOCKETIO_MESSAGE_QUEUE"):
+        parser.error("--workers > 1 needs SOCKETIO_MESSAGE_QUEUE (e.g. redis://localhost:6379/0) "
+                     "so live updates reach clients of every worker")
+
+    if args.workers > 1:
+        prepare_shared(TICKERS)
+        prefork.serve(app, args.workers, args.host, args.port, on_start=start_worker)
+
+    # Load checkpoints and scalers once so /predict only runs inference
+    registry.warm(TICKERS)
+
+    hub.start()
+
     # Run WebSocket in a separate thread
     socket_thread = threading.Thread(target=start_socket_client)
     socket_thread.start()
 
     # Use socketio.run to support both Flask and WebSocket with CORS
-    socketio.run(app, port=5000)
+    socketio.run(app, host=args.host, port=args.port)
@@ -1,37 +1,258 @@
+import os
 import websocket
 import threading
+import queue
 import json
-from try_run import simulate_trading_with_gemini 
+from collections import deque
+import numpy as np
+from explanations import get_explainer
+from indicators import load_engine
+from inference import predict_batch, checkpoint_path, inverse_target
+from registry import registry
+from metrics import metrics
+from hub import hub
+from streaming import StreamingCTTS
+from tick_protocol import DEFAULT_BATCH, hello, decode_frame, format_time
+
+DEFAULT_TICKER = "INFY.NS"  # the /api/ws feed replays Data_INFY.NS.csv
+SEQ_LENGTH = 100
+THRESHOLD = 0.015
+DECISION_WORKERS = 2
+TICK_QUEUE_SIZE = 1024
+EXPLANATION_QUEUE_SIZE = 32
+STREAMING = True  # incremental CTTS per ticker (streaming.py) instead of a full forward per decision
+BINARY_TICKS = True  # ask the feed for batched binary frames (tick_protocol.py); JSON per bar otherwise
+# Bars per feed interval; above 1 the feed replays history faster than real time
+REPLAY_BATCH = int(os.getenv("TICK_REPLAY_BATCH", DEFAULT_BATCH))
 
 latest_stock_data = {}
 
 
+class TickerState:
+    def __init__(self, ticker, seq_length):
+        self.model_path = checkpoint_path(ticker)
+        _, values, scaler, features = registry.get(ticker, self.model_path)
+        self.features = features
+        self.scaler = scaler
+        # Indicator state as of the last stored bar, so live ticks continue the stored series
+        self.engine = load_engine(ticker)
+        self.rows = 0  # rows appended since startup
+        self.stream = None
+        self.streamed = 0  # value of `rows` the stream has consumed
+        # Seed with stored history so decisions can start on the first tick
+        self.window = deque((row for row in np.asarray(values[-seq_length:], dtype=np.float64)), maxlen=seq_length)
+
+    def update(self, bar):
+        row = self.engine.feature_row(bar, self.features)
+        if self.window:
+            # Indicators are NaN while the engine warms up (short stored history); hold the previous values
+            row = np.where(np.isnan(row), self.window[-1], row)
+        self.window.append(row)
+        self.rows += 1
+        return row
+
+    def update_many(self, columns, values):
+        # Bars decoded from a binary frame, already floats
+        for row in values.tolist():
+            self.update(dict(zip(columns, row)))
+
+
+class TickPipeline:
+    """
+    Staged, non-blocking consumer for the /api/ws tick feed.
+
+    receive (websocket thread) -> tick queue -> feature worker -> latest bar per
+    ticker -> decision workers -> explanation queue -> explanation worker
+
+    The receive callback only parses and enqueues, dropping the oldest tick
+    when the bounded queue is full. Decisions coalesce per ticker, so a slow
+    model or LLM call is skipped over by newer bars instead of queueing
+    behind them.
+    """
+
+    def __init__(self, seq_length=SEQ_LENGTH, decision_workers=DECISION_WORKERS):
+        self.seq_length = seq_length
+        self.decision_workers = decision_workers
+        self.ticks = queue.Queue(maxsize=TICK_QUEUE_SIZE)
+        self.explanations = queue.Queue(maxsize=EXPLANATION_QUEUE_SIZE)
+        self.ready = queue.Queue()  # tickers with a pending bar, each at most once
+        self.pending = {}  # {ticker: (bar, window)}
+        self.in_flight = set()
+        self.states = {}
+        self.lock = threading.Lock()
+        self.ws = None
+        self.columns = None  # column order of binary frames, from the feed's hello
+        self.dropped_ticks = 0
+        self.started = False
+
+    def start(self, ws):
+        self.ws = ws
+        if self.started:
+            return
+        self.started = True
+        threading.Thread(target=self.feature_worker, daemon=True).start()
+        for _ in range(self.decision_workers):
+            threading.Thread(target=self.decision_worker, daemon=True).start()
+        threading.Thread(target=self.explanation_worker, daemon=True).start()
+
+    def submit(self, data):
+        metrics.inc("ticks_received")
+        self.enqueue(data)
+
+    def submit_batch(self, ticker, times, values):
+        """
+        Queue one ticker's bars from a binary frame as a single item.
+        """
+        metrics.inc("ticks_received", len(values))
+        self.enqueue((ticker, times, values))
+
+    def enqueue(self, item):
+        try:
+            self.ticks.put_nowait(item)
+        except queue.Full:
+            try:
+                self.ticks.get_nowait()
+            except queue.Empty:
+                pass
+            self.dropped_ticks += 1
+            metrics.inc("ticks_dropped")
+            self.ticks.put_nowait(item)
+
+    def feature_worker(self):
+        while True:
+            item = self.ticks.get()
+            ticker = item.get("ticker", DEFAULT_TICKER) if isinstance(item, dict) else item[0]
+            try:
+                state = self.states.get(ticker)
+                if state is None:
+                    state = self.states[ticker] = TickerState(ticker, self.seq_length)
+                with metrics.span("tick_features"):
+                    if isinstance(item, dict):
+                        data = item
+                        state.update(data)
+                    else:
+                        # A batch costs one window snapshot below, not one per bar
+                        _, times, values = item
+                        state.update_many(self.columns, values)
+                        data = {"ticker": ticker, "Datetime": format_time(int(times[-1]))}
+                snapshot = (data, np.array(state.window), state.rows)
+            except Exception as e:
+                print(f"Feature update failed for {ticker}: {e}")
+                continue
+
+            with self.lock:
+                fresh = ticker not in self.pending and ticker not in self.in_flight
+                self.pending[ticker] = snapshot
+            if fresh:
+                self.ready.put(ticker)
+
+    def decision_worker(self):
+        while True:
+            ticker = self.ready.get()
+            with self.lock:
+                data, window, rows = self.pending.pop(ticker)
+                self.in_flight.add(ticker)
+            try:
+                with metrics.span("tick_decide"):
+                    self.decide(ticker, data, window, rows)
+            except Exception as e:
+                print(f"Decision failed for {ticker}: {e}")
+            finally:
+                with self.lock:
+                    self.in_flight.discard(ticker)
+                    requeue = ticker in self.pending
+                if requeue:
+                    self.ready.put(ticker)
+
+    def predict_next(self, ticker, state, window, rows):
+        if not STREAMING:
+            predicted = predict_batch([(ticker, state.scaler.transform(window), 1)], self.seq_length)[0]
+            return None if predicted is None else float(predicted[0])
+
+        # Only one decision per ticker runs at a time, so the stream needs no lock
+        model = registry.get_model(state.model_path, len(state.features))
+        if state.stream is None or state.stream.model is not model:
+            ticker_id = registry.get_artifact(state.model_path).ticker_id(ticker)
+            state.stream = StreamingCTTS(model, self.seq_length, ticker_id)
+            state.streamed = rows - len(window)
+
+        # Coalesced ticks arrive together; feed every row the stream hasn't seen
+        new_rows = window[-min(rows - state.streamed, len(window)):]
+        scaled = state.stream.advance(state.scaler.transform(new_rows))
+        state.streamed = rows
+        return float(inverse_target(state.scaler, scaled, len(state.features))[0])
+
+    def decide(self, ticker, data, window, rows):
+        state = self.states[ticker]
+        close_index = state.features.index("Close")
+        current_price = float(window[-1, close_index])
+
+        predicted_price = self.predict_next(ticker, state, window, rows)
+        if predicted_price is None:
+            return
+
+        if predicted_price > current_price * (1 + THRESHOLD):
+            decision = "BUY"
+        elif predicted_price < current_price * (1 - THRESHOLD):
+            decision = "SELL"
+        else:
+            decision = "HOLD"
+
+        content = {
+            "Datetime": data.get("Datetime"),
+            "Ticker": ticker,
+            "Close": current_price,
+            "Predicted": predicted_price,
+            "Decision": decision,
+        }
+        self.send({"type": "log", "content": content})
+
+        if decision != "HOLD":
+            history = window[:, close_index].tolist()
+            try:
+                self.explanations.put_nowait((content, history))
+            except queue.Full:
+                pass  # explanations are best-effort; never hold up decisions
+
+    def explanation_worker(self):
+        while True:
+            content, history = self.explanations.get()
+            # Pacing is left to the explainer's shared rate limiter
+            item = (content["Ticker"], content["Decision"], content["Close"], [content["Predicted"]], history)
+            reason = get_explainer().explain([item])[0]
+            self.send({"type": "log", "content": dict(content, Reason=reason)})
+
+    def send(self, message):
+        # Dashboards subscribed to the ticker get it through the SocketIO hub
+        content = message["content"]
+        hub.publish_log(content["Ticker"], content)
+        try:
+            self.ws.send(json.dumps(message))
+            print("Sent log back to server:", message)
+        except Exception as e:
+            print("Error sending log:", e)
+
+
+pipeline = TickPipeline()
+metrics.gauge("tick_queue_depth", pipeline.ticks.qsize, "Ticks waiting for the feature worker.")
+metrics.gauge("explanation_queue_depth", pipeline.explanations.qsize, "Decisions waiting for an explanation.")
+
+
 def on_message(ws, message):
     global latest_stock_data
+    # Parse and hand off; all slow work happens on the pipeline's worker threads
+    if isinstance(message, bytes):
+        for ticker, times, values in decode_frame(message):
+            pipeline.submit_batch(ticker, times, values)
+        return
+
     data = json.loads(message)
+    if data.get("type") == "hello":
+        pipeline.columns = data.get("columns")
+        print(f"Tick feed format: {data.get('format')}")
+        return
     latest_stock_data = data
-    print("\nReceived:", data)
-
-    # Use your prediction algorithm
-    balance, profit, trade_log = simulate_trading_with_gemini(data)
-    decision = "BUY" if ("buy" or "BUY") in trade_log else "HOLD"
-    decision = "SELL" if ("sell" or "SELL") in trade_log else "HOLD"
-    log_message = {
-        "type": "log",
-        "content": {
-            "Datetime": data.get("Datetime"),
-            "Final Balance": balance,
-            "Total Profit": profit,
-            "Trade Log": trade_log,
-            "Decision": decision
-        }
-    }
-
-    try:
-        ws.send(json.dumps(log_message))
-        print("Sent log back to server:", log_message)
-    except Exception as e:
-        print("Error sending log:", e)
+    pipeline.submit(data)
 
 
 def on_error(ws, error):
@@ -42,6 +263,10 @@ def on_close(ws, close_status_code, close_msg):
 
 def on_open(ws):
     print("WebSocket Connection Opened")
+    pipeline.start(ws)
+    if BINARY_TICKS:
+        # Feeds that don't know the hello ignore it and keep sending JSON
+        ws.send(hello(REPLAY_BATCH))
 
 def start_socket_client():
     ws = websocket.WebSocketApp(
@@ -56,4 +281,4 @@ def start_socket_client():
 def run_client():
     thread = threading.Thread(target=start_socket_client)
     thread.daemon = True
-    thread.start()
\ No newline at end of file
+    thread.start()
@@ -0,0 +1,107 @@
+import torch
+import torch.nn.functional as F
+from torch.nn.utils.fusion import fuse_conv_bn_weights
+
+# Max |streaming - full recompute| on scaled outputs. The cached convolution
+# outputs come from the same inputs, only computed in smaller slices, so the
+# difference is float32 summation order (~1e-7 in practice) and does not
+# grow with the number of ticks.
+STREAM_TOLERANCE = 1e-5
+
+
+class StreamingCTTS:
+    """
+    Tick-by-tick inference for one ticker's sliding window.
+
+    The conv1/conv2 block outputs are cached per row. When rows arrive, only
+    the new rows and the positions next to the window edges (whose zero
+    padding changed) are recomputed; max pooling, the transformer and the
+    output layers then rerun on the cached stream, since every token's
+    attention changes when the window slides.
+
+    Rows live in buffers of twice the window length, compacted when full,
+    so appending a row costs O(1) amortized instead of a copy of the window.
+
+    `model` must be an eval-mode CTTS (eager); windows are scaled
+    (rows, features) arrays. `ticker_id` is required for shared models.
+    """
+
+    def __init__(self, model, seq_length, ticker_id=None):
+        self.model = model
+        self.seq_length = seq_length
+        param = next(model.parameters())
+        self.device, self.dtype = param.device, param.dtype
+        self.ticker_ids = None if ticker_id is None else torch.tensor([ticker_id], device=self.device)
+
+        # BatchNorm folded into the convolutions once, as in export.fold_batchnorm
+        self.conv1 = fuse_conv_bn_weights(model.conv1.weight, model.conv1.bias, model.bn1.running_mean,
+                                          model.bn1.running_var, model.bn1.eps, model.bn1.weight, model.bn1.bias)
+        self.conv2 = fuse_conv_bn_weights(model.conv2.weight, model.conv2.bias, model.bn2.running_mean,
+                                          model.bn2.running_var, model.bn2.eps, model.bn2.weight, model.bn2.bias)
+
+        capacity = 2 * seq_length
+        self.x = torch.zeros((model.conv1.in_channels, capacity), dtype=self.dtype, device=self.device)
+        self.h1 = torch.zeros((model.conv1.out_channels, capacity), dtype=self.dtype, device=self.device)
+        self.h2 = torch.zeros((model.conv2.out_channels, capacity), dtype=self.dtype, device=self.device)
+        self.start = self.end = 0  # window is buffer[:, start:end]
+
+    def conv_block(self, weights, buffer, first, last):
+        # Block output for window positions [first, last), with zero padding at the window edges
+        lo, hi = self.start + first - 1, self.start + last + 1
+        inputs = buffer[:, max(lo, self.start):min(hi, self.end)]
+        if lo < self.start or hi > self.end:
+            inputs = F.pad(inputs, (max(self.start - lo, 0), max(hi - self.end, 0)))
+        return F.relu(F.conv1d(inputs.unsqueeze(0), *weights))[0]
+
+    def reset(self, window):
+        """
+        Full recompute from a scaled (rows, features) window.
+        """
+        with torch.inference_mode():
+            window = torch.as_tensor(window[-self.seq_length:], dtype=self.dtype, device=self.device)
+            n = len(window)
+            self.start, self.end = 0, n
+            self.x[:, :n] = window.T
+            self.h1[:, :n] = self.conv_block(self.conv1, self.x, 0, n)
+            self.h2[:, :n] = self.conv_block(self.conv2, self.h1, 0, n)
+        return self.predict()
+
+    def advance(self, rows):
+        """
+        Append scaled (k, features) rows and return the next scaled prediction.
+        """
+        old_n = self.end - self.start
+        if old_n < 2 or len(rows) >= self.seq_length - 4:
+            window = rows if old_n == 0 else torch.cat((self.x[:, self.start:self.end].T, torch.as_tensor(rows, dtype=self.dtype, device=self.device)))
+            return self.reset(window)
+
+        with torch.inference_mode():
+            rows = torch.as_tensor(rows, dtype=self.dtype, device=self.device)
+            k = len(rows)
+            if self.end + k > self.x.shape[1]:
+                # Compact: move the window to the front of the buffers
+                for buffer in (self.x, self.h1, self.h2):
+                    buffer[:, :old_n] = buffer[:, self.start:self.end].clone()
+                self.start, self.end = 0, old_n
+
+            self.x[:, self.end:self.end + k] = rows.T
+            self.end += k
+            dropped = max(self.end - self.start - self.seq_length, 0)
+            self.start += dropped
+            n = self.end - self.start
+
+            # Window positions whose inputs or padding changed: the new rows, the old
+            # last rows (which lost their right edge) and, if rows fell off, the first rows
+            h1_from = old_n - dropped - 1
+            h2_from = old_n - dropped - 2
+            self.h1[:, self.start + h1_from:self.end] = self.conv_block(self.conv1, self.x, h1_from, n)
+            if dropped:
+                self.h1[:, self.start:self.start + 1] = self.conv_block(self.conv1, self.x, 0, 1)
+            self.h2[:, self.start + h2_from:self.end] = self.conv_block(self.conv2, self.h1, h2_from, n)
+            if dropped:
+                self.h2[:, self.start:self.start + 2] = self.conv_block(self.conv2, self.h1, 0, 2)
+        return self.predict()
+
+    def predict(self):
+        with torch.inference_mode():
+            return self.model.head(self.h2[:, self.start:self.end].unsqueeze(0), self.ticker_ids)[0].cpu().numpy()
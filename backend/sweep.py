@@ -0,0 +1,228 @@
+import os
+import csv
+import argparse
+import itertools
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from backtest import run_backtest
+
+# Per-worker view of the shared price arrays, set up by attach_prices
+shared_stock_data = None
+shared_block = None
+
+
+def grid(lookaheads, thresholds, balances):
+    return [
+        {"lookahead": lookahead, "threshold": threshold, "initial_balance": balance}
+        for lookahead, threshold, balance in itertools.product(lookaheads, thresholds, balances)
+    ]
+
+
+def random_search(n, lookahead_range, threshold_range, balances, seed=42):
+    rng = np.random.default_rng(seed)
+    return [
+        {
+            "lookahead": int(rng.integers(lookahead_range[0], lookahead_range[1] + 1)),
+            "threshold": round(float(rng.uniform(*threshold_range)), 4),
+            "initial_balance": float(rng.choice(balances)),
+        }
+        for _ in range(n)
+    ]
+
+
+def walk_forward_windows(n_days, n_windows):
+    """
+    Split [0, n_days) into `n_windows` consecutive, non-overlapping (start, end) windows.
+    """
+    bounds = np.linspace(0, n_days, n_windows + 1).astype(int)
+    return [(int(start), int(end)) for start, end in zip(bounds[:-1], bounds[1:]) if end - start > 1]
+
+
+def share_prices(stock_data):
+    """
+    Copy every actual/predicted series into one shared-memory block.
+
+    Returns (block, layout) where layout is {stock: (actual_offset, actual_len,
+    predicted_offset, predicted_len)}; workers rebuild read-only views from it
+    instead of receiving a pickled copy of the arrays.
+    """
+    layout, offset = {}, 0
+    for stock, (actual, predicted) in stock_data.items():
+        layout[stock] = (offset, len(actual), offset + len(actual), len(predicted))
+        offset += len(actual) + len(predicted)
+
+    block = shared_memory.SharedMemory(create=True, size=max(offset, 1) * 8)
+    buffer = np.ndarray((offset,), dtype=np.float64, buffer=block.buf)
+    for stock, (actual, predicted) in stock_data.items():
+        a_start, a_len, p_start, p_len = layout[stock]
+        buffer[a_start:a_start + a_len] = actual
+        buffer[p_start:p_start + p_len] = predicted
+    return block, layout
+
+
+def attach_prices(name, layout):
+    global shared_stock_data, shared_block
+    shared_block = shared_memory.SharedMemory(name=name)
+    buffer = np.ndarray((shared_block.size // 8,), dtype=np.float64, buffer=shared_block.buf)
+    buffer.flags.writeable = False
+    shared_stock_data = {
+        stock: (buffer[a_start:a_start + a_len], buffer[p_start:p_start + p_len])
+        for stock, (a_start, a_len, p_start, p_len) in layout.items()
+    }
+
+
+def evaluate(job):
+    """
+    Backtest one parameter set on one window of the shared prices.
+    """
+    params, (start, end) = job
+    window = {stock: (actual[start:end], predicted[start:end]) for stock, (actual, predicted) in shared_stock_data.items()}
+    balance, events, final_events = run_backtest(window, **params)
+    trades = sum(1 for event in events if event[2] != "HOLD") + len(final_events)
+    return dict(params, start=start, end=end, final_balance=balance, profit=balance - params["initial_balance"], trades=trades)
+
+
+def run_sweep(stock_data, param_sets, n_windows=1, workers=None):
+    """
+    Backtest every parameter set on every walk-forward window in parallel.
+
+    Returns one result dict per (parameter set, window).
+    """
+    n_days = len(next(iter(stock_data.values()))[0])
+    windows = walk_forward_windows(n_days, n_windows)
+    jobs = [(params, window) for params in param_sets for window in windows]
+
+    block, layout = share_prices(stock_data)
+    try:
+        with ProcessPoolExecutor(max_workers=workers, initializer=attach_prices, initargs=(block.name, layout)) as pool:
+            return list(pool.map(evaluate, jobs, chunksize=max(1, len(jobs) // (4 * (workers or os.cpu_count() or 1)))))
+    finally:
+        block.close()
+        block.unlink()
+
+
+def param_key(result):
+    return (result["lookahead"], result["threshold"], result["initial_balance"])
+
+
+def rank(results):
+    """
+    Aggregate per parameter set across windows, best mean profit first.
+    """
+    by_params = {}
+    for result in results:
+        by_params.setdefault(param_key(result), []).append(result)
+
+    table = []
+    for (lookahead, threshold, balance), rows in by_params.items():
+        profits = [row["profit"] for row in rows]
+        table.append({
+            "lookahead": lookahead,
+            "threshold": threshold,
+            "initial_balance": balance,
+            "mean_profit": float(np.mean(profits)),
+            "min_profit": float(np.min(profits)),
+            "max_profit": float(np.max(profits)),
+            "trades": sum(row["trades"] for row in rows),
+            "windows": len(rows),
+        })
+    table.sort(key=lambda row: row["mean_profit"], reverse=True)
+    return table
+
+
+def walk_forward(results):
+    """
+    Pick the best parameters on each window and score them on the next one.
+    """
+    by_window = {}
+    for result in results:
+        by_window.setdefault((result["start"], result["end"]), []).append(result)
+    windows = sorted(by_window)
+
+    folds = []
+    for in_sample, out_of_sample in zip(windows[:-1], windows[1:]):
+        best = max(by_window[in_sample], key=lambda row: row["profit"])
+        scored = next(row for row in by_window[out_of_sample] if param_key(row) == param_key(best))
+        folds.append({
+            "in_sample": in_sample,
+            "out_of_sample": out_of_sample,
+            "lookahead": best["lookahead"],
+            "threshold": best["threshold"],
+            "in_sample_profit": best["profit"],
+            "out_of_sample_profit": scored["profit"],
+        })
+    return folds
+
+
+def write_table(rows, path):
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=list(rows[0]))
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def load_stock_data(tickers, steps=50, seq_length=100):
+    # Same inputs as the try_run entry point: closes every `steps` rows against a rollout
+    from inference import predict_batch
+    from registry import registry
+
+    stock_data = {}
+    preds = predict_batch([(ticker, None, steps) for ticker in tickers], seq_length=seq_length)
+    for ticker, pred in zip(tickers, preds):
+        if pred is None:
+            continue
+        values, _, features = registry.get_data(ticker)
+        stock_data[ticker] = (values[::steps, features.index('Close')].astype(np.float64), pred)
+    return stock_data
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sweep simulate_dynamic_portfolio_trading parameters.")
+    parser.add_argument("--tickers", nargs="+", default=["RELIANCE.NS", "INFY.NS", "ITC.NS"])
+    parser.add_argument("--lookahead", nargs="+", type=int, default=[3, 5, 10, 20])
+    parser.add_argument("--threshold", nargs="+", type=float, default=[0.005, 0.01, 0.015, 0.02, 0.03])
+    parser.add_argument("--balance", nargs="+", type=float, default=[10000])
+    parser.add_argument("--random", type=int, help="Sample this many points instead of the full grid")
+    parser.add_argument("--windows", type=int, default=1, help="Walk-forward windows")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--top", type=int, default=10)
+    parser.add_argument("--out", help="Write the ranked table to this CSV")
+    args = parser.parse_args()
+
+    if args.random:
+        param_sets = random_search(
+            args.random,
+            (min(args.lookahead), max(args.lookahead)),
+            (min(args.threshold), max(args.threshold)),
+            args.balance,
+        )
+    else:
+        param_sets = grid(args.lookahead, args.threshold, args.balance)
+
+    stock_data = load_stock_data(args.tickers)
+    results = run_sweep(stock_data, param_sets, n_windows=args.windows, workers=args.workers)
+    table = rank(results)
+
+    print(f"\n{len(param_sets)} parameter sets x {args.windows} window(s)")
+    print(f"{'lookahead':>9} {'threshold':>9} {'balance':>10} {'mean profit':>12} {'min profit':>12} {'trades':>7}")
+    for row in table[:args.top]:
+        print(f"{row['lookahead']:>9} {row['threshold']:>9.4f} {row['initial_balance']:>10.0f} "
+              f"{row['mean_profit']:>12.2f} {row['min_profit']:>12.2f} {row['trades']:>7}")
+
+    if args.windows > 1:
+        print("\nWalk-forward:")
+        for fold in walk_forward(results):
+            print(f"{fold['in_sample']} -> {fold['out_of_sample']}: lookahead={fold['lookahead']} "
+                  f"threshold={fold['threshold']} in-sample {fold['in_sample_profit']:.2f}, "
+                  f"out-of-sample {fold['out_of_sample_profit']:.2f}")
+
+    if args.out and table:
+        write_table(table, args.out)
+        print(f"\nSaved ranked table to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
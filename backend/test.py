@@ -1,21 +1,19 @@
 import torch
-import torch.nn as nn
 import numpy as np
-import pandas as pd
 from sklearn.preprocessing import MinMaxScaler
 from sklearn.metrics import mean_squared_error, r2_score
-from model import CTTS  # Custom model class
+from torch.utils.data import DataLoader
+from artifacts import load_artifact
+from feature_store import load_features
+from windowing import SequenceDataset
 import os
 
 device = torch.device("cuda:0" if torch.cuda.is_available() else "cpu")
 
 
-def load_and_prepare_data(filepath):
-    df = pd.read_csv(filepath)
-    df.drop(columns=['Date'], inplace=True)
-    FEATURES = df.columns.tolist()
-    df = df[FEATURES]
-    return df, FEATURES
+def load_and_prepare_data(ticker, data_dir="data"):
+    values, FEATURES, _ = load_features(ticker, data_dir)
+    return values, FEATURES
 
 
 def normalize_data(df):
@@ -24,31 +22,21 @@ def normalize_data(df):
     return scaled_data, scaler
 
 
-def create_sequences(data, seq_length):
-    X, y = [], []
-    for i in range(len(data) - seq_length):
-        X.append(data[i:i + seq_length])
-        y.append(data[i + seq_length, 0])
-    return np.array(X), np.array(y)
-
-
-def prepare_tensors(X, y):
-    X_tensor = torch.tensor(X, dtype=torch.float32).to(device)
-    y_tensor = torch.tensor(y, dtype=torch.float32).unsqueeze(1).to(device)
-    return X_tensor, y_tensor
-
-
 def load_model(path, input_dim):
-    model = CTTS(input_dim=input_dim).to(device)
-    model.load_state_dict(torch.load(path))
-    model.eval()
-    return model
+    artifact = load_artifact(path)
+    if artifact.input_dim != input_dim:
+        raise ValueError(f"{path} expects {artifact.input_dim} features, got {input_dim}")
+    return artifact.build_model(device)
 
 
-def evaluate_model(model, X, y):
+def evaluate_model(model, loader):
+    predictions, actuals = [], []
     with torch.no_grad():
-        predictions = model(X).cpu().numpy()
-    actuals = y.cpu().numpy()
+        for X, y in loader:
+            predictions.append(model(X.to(device)).cpu().numpy())
+            actuals.append(y.numpy())
+    predictions = np.concatenate(predictions)
+    actuals = np.concatenate(actuals)
 
     mse = mean_squared_error(actuals, predictions)
     r2 = r2_score(actuals, predictions)
@@ -71,19 +59,25 @@ def show_sample_predictions(y_true, y_pred, scaler, features, sample_size=5):
 
         print(f"Actual: {actual:.2f} | Predicted: {predicted:.2f}")
 
-def run_evaluation(ticker, model_dir="models", data_dir="data", seq_length=100):
+def run_evaluation(ticker, model_dir="models", data_dir="data", seq_length=100, batch_size=256):
     print(f"\n📈 Evaluating model for: {ticker}")
-    filepath = os.path.join(data_dir, f"Data_{ticker}.csv")
     model_path = os.path.join(model_dir, f"model_{ticker}.pth")
 
     try:
-        df, features = load_and_prepare_data(filepath)
-        data, scaler = normalize_data(df)
-        X_np, y_np = create_sequences(data, seq_length)
-        X_tensor, y_tensor = prepare_tensors(X_np, y_np)
+        values, features = load_and_prepare_data(ticker, data_dir)
+        artifact = load_artifact(model_path)
+        if artifact.scaler is not None:
+            # Scale with the training-time scaler and column order
+            values = np.asarray(values)[:, [features.index(name) for name in artifact.features]]
+            data, scaler, features = artifact.scaler.transform(values), artifact.scaler, artifact.features
+        else:
+            data, scaler = normalize_data(values)
+        # Windows are sliced on demand, so only one batch is on the device at a time;
+        # multi-horizon models are scored on every step they predict
+        loader = DataLoader(SequenceDataset(data, seq_length, horizon=artifact.horizon), batch_size=batch_size)
 
         model = load_model(model_path, input_dim=len(features))
-        y_pred, y_true, mse, r2, accuracy = evaluate_model(model, X_tensor, y_tensor)
+        y_pred, y_true, mse, r2, accuracy = evaluate_model(model, loader)
 
         print(f"✅ Mean Squared Error (MSE): {mse:.6f}")
         print(f"✅ R-squared (R2) Score: {r2:.6f}")
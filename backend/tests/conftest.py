@@ -0,0 +1,5 @@
+import os
+import sys
+
+# The backend modules are run as scripts from backend/, not installed as a package
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,120 @@
+import random
+
+import pytest
+
+from try_run import simulate_dynamic_portfolio_trading, simulate_trading_with_gemini
+
+CASES = 3000
+
+
+def reference_simulation(stock_data, initial_balance, lookahead, threshold):
+    """
+    The per-day loop the vectorized backtest replaced (simulate_dynamic_portfolio_trading
+    before backtest.py), kept verbatim as the source of truth.
+    """
+    balance = initial_balance
+    positions = {}
+    trade_log = []
+
+    n_days = len(next(iter(stock_data.values()))[0])
+
+    for day in range(n_days - 1):
+        for stock, (actual, predicted) in stock_data.items():
+            current_price = actual[day]
+            future_prices = predicted[day + 1: day + 1 + lookahead]
+            avg_future = sum(future_prices) / len(future_prices) if future_prices else current_price
+
+            position = positions.get(stock)
+            action = None
+
+            if position is None:
+                if avg_future > current_price * (1 + threshold):
+                    shares = int(balance // current_price)
+                    if shares > 0:
+                        balance -= shares * current_price
+                        positions[stock] = {"type": "long", "shares": shares, "entry_price": current_price}
+                        action = "BUY"
+                elif avg_future < current_price * (1 - threshold):
+                    shares = int(balance // current_price)
+                    if shares > 0:
+                        balance += shares * current_price
+                        positions[stock] = {"type": "short", "shares": shares, "entry_price": current_price}
+                        action = "SHORT"
+            elif position["type"] == "long":
+                if avg_future < current_price:
+                    balance += position["shares"] * current_price
+                    action = "SELL"
+                    positions.pop(stock)
+                else:
+                    action = "HOLD"
+            elif position["type"] == "short":
+                if avg_future > current_price:
+                    profit = position["shares"] * (position["entry_price"] - current_price)
+                    balance += profit
+                    action = "COVER"
+                    positions.pop(stock)
+                else:
+                    action = "HOLD"
+
+            if action:
+                trade_log.append((day, stock, action, current_price, balance))
+
+    for stock, pos in positions.items():
+        final_price = stock_data[stock][0][-1]
+        if pos["type"] == "long":
+            balance += pos["shares"] * final_price
+            trade_log.append((n_days - 1, stock, "FINAL SELL", final_price, balance))
+        elif pos["type"] == "short":
+            profit = pos["shares"] * (pos["entry_price"] - final_price)
+            balance += profit
+            trade_log.append((n_days - 1, stock, "FINAL COVER", final_price, balance))
+
+    return balance, balance - initial_balance, trade_log
+
+
+def random_case(rng):
+    """
+    Small portfolios built to hit the edge cases: tied and near-threshold
+    lookahead means, prices the balance can just (not) afford, and prediction
+    series shorter or longer than the price series.
+    """
+    n_stocks = rng.randint(1, 4)
+    n_days = rng.randint(2, 30)
+    threshold = rng.choice([0.0, 0.01, 0.02, 0.1, 0.5])
+    lookahead = rng.randint(1, 7)
+    initial_balance = rng.choice([50, 1000, 10000])
+    stock_data = {}
+    for s in range(n_stocks):
+        if rng.random() < 0.5:
+            actual = [float(rng.choice([10, 20, 25, 50, 100])) for _ in range(n_days)]
+        else:
+            actual = [round(rng.uniform(5, 200), rng.choice([0, 2, 6])) for _ in range(n_days)]
+        n_predicted = max(0, n_days + rng.randint(-5, 5))
+        predicted = []
+        for day in range(n_predicted):
+            base = actual[min(day, n_days - 1)]
+            predicted.append(rng.choice([
+                base,
+                base * (1 + threshold),
+                base * (1 - threshold),
+                round(base * rng.uniform(0.8, 1.2), 2),
+            ]))
+        stock_data[f"S{s}"] = (actual, predicted)
+    return stock_data, initial_balance, lookahead, threshold
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_backtest_matches_reference_loop(seed):
+    rng = random.Random(seed)
+    for case in range(CASES // 3):
+        stock_data, initial_balance, lookahead, threshold = random_case(rng)
+        expected = reference_simulation(stock_data, initial_balance, lookahead, threshold)
+        context = f"seed {seed} case {case}: {stock_data!r} balance={initial_balance} lookahead={lookahead} threshold={threshold}"
+
+        assert simulate_dynamic_portfolio_trading(stock_data, initial_balance, lookahead, threshold) == expected, context
+
+        # Same decisions under the other labels; its reasons are filled in separately
+        balance, profit, log = simulate_trading_with_gemini(stock_data, initial_balance, lookahead, threshold, explain=False)
+        labels = {"COVER": "SELL", "FINAL COVER": "FINAL SELL"}
+        assert (balance, profit) == expected[:2], context
+        assert [entry[:5] for entry in log] == [(d, s, labels.get(a, a), p, b) for d, s, a, p, b in expected[2]], context
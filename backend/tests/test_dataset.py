@@ -0,0 +1,50 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+pytest.importorskip("pandas_ta")
+
+import feature_store
+from dataset import ReplaySource, ingest_ticker
+
+TICKER = "TEST.NS"
+
+
+def bars(n_rows, seed=0):
+    rng = np.random.default_rng(seed)
+    close = 1000 * np.exp(np.cumsum(rng.normal(0, 0.01, n_rows)))
+    return pd.DataFrame({
+        "Date": pd.date_range("2020-01-01", periods=n_rows, freq="D"),
+        "Close": close,
+        "High": close * 1.01,
+        "Low": close * 0.99,
+        "Open": close,
+        "Volume": rng.integers(1_000, 100_000, n_rows).astype(float),
+    })
+
+
+def test_replayed_ingest_appends_only_new_bars(tmp_path):
+    replay_dir, data_dir = tmp_path / "replay", tmp_path / "data"
+    replay_dir.mkdir()
+    data_dir.mkdir()
+    history = bars(120)
+    source = ReplaySource(str(replay_dir))
+
+    history[:80].to_csv(replay_dir / f"{TICKER}.csv", index=False)
+    assert ingest_ticker(TICKER, source, str(data_dir)) == 80
+
+    # The replay now overlaps the stored bars; only the 40 newer ones count
+    history.to_csv(replay_dir / f"{TICKER}.csv", index=False)
+    assert ingest_ticker(TICKER, source, str(data_dir)) == 40
+    assert ingest_ticker(TICKER, source, str(data_dir)) == 0
+
+    times = np.asarray(feature_store.load_timestamps(TICKER, str(data_dir)))
+    assert len(times) == len(history)
+    assert np.all(np.diff(times) > 0)
+
+    csv = pd.read_csv(feature_store.csv_path(TICKER, str(data_dir)))
+    assert len(csv) == len(history)
+    assert not csv["Date"].duplicated().any()
+
+    values, features, _ = feature_store.load_store(TICKER, str(data_dir))
+    np.testing.assert_allclose(values[:, features.index("Close")], history["Close"], rtol=1e-6)
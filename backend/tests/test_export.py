@@ -0,0 +1,41 @@
+import pytest
+import torch
+
+from artifacts import save_artifact
+from export import check_parity, PARITY_TOLERANCE, QUANTIZED_PARITY_TOLERANCE
+from model import CTTS
+
+INPUT_DIM = 12
+
+MODELS = {
+    "full": {},
+    "shared": {"num_tickers": 3},
+    "horizon": {"output_dim": 5},
+    "local": {"attention": "local", "window": 16},
+}
+
+
+@pytest.fixture(params=list(MODELS))
+def checkpoint(request, tmp_path):
+    torch.manual_seed(0)
+    model = CTTS(INPUT_DIM, **MODELS[request.param]).eval()
+    path = str(tmp_path / "model.pth")
+    save_artifact(path, model, None, None, seq_length=100)
+    return request.param, path
+
+
+@pytest.mark.parametrize("seq_length", [60, 100])
+def test_torchscript_matches_eager(checkpoint, seq_length):
+    name, path = checkpoint
+    if name == "local":
+        with pytest.raises(ValueError):
+            check_parity(path, "torchscript", seq_length)
+        return
+    assert check_parity(path, "torchscript", seq_length) <= QUANTIZED_PARITY_TOLERANCE
+
+
+@pytest.mark.parametrize("seq_length", [60, 100])
+def test_onnx_matches_eager(checkpoint, seq_length):
+    pytest.importorskip("onnxruntime")
+    _, path = checkpoint
+    assert check_parity(path, "onnx", seq_length) <= PARITY_TOLERANCE
@@ -0,0 +1,28 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+pytest.importorskip("pandas_ta")
+
+from dataset import compute_technical_indicators
+from indicators import IncrementalIndicators, INDICATOR_COLUMNS
+
+
+def closes(n_rows, seed):
+    rng = np.random.default_rng(seed)
+    close = 1000 * np.exp(np.cumsum(rng.normal(0, 0.01, n_rows)))
+    close[50:60] = close[49]  # a flat stretch: no gains or losses for RSI
+    return close
+
+
+@pytest.mark.parametrize("seed", [0, 1, 2])
+def test_incremental_matches_batch(seed):
+    close = closes(300, seed)
+    df = pd.DataFrame({"Close": close, "High": close * 1.01, "Low": close * 0.99, "Open": close, "Volume": 1e4})
+    batch = compute_technical_indicators(df, backfill=False)[INDICATOR_COLUMNS].to_numpy(dtype=np.float64)
+
+    engine = IncrementalIndicators()
+    for i, value in enumerate(close.tolist()):
+        row = engine.update_close(value)
+        np.testing.assert_allclose(row, batch[i], rtol=1e-9, atol=1e-9, equal_nan=True,
+                                   err_msg=f"bar {i}: {dict(zip(INDICATOR_COLUMNS, row))}")
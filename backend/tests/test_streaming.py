@@ -0,0 +1,51 @@
+import numpy as np
+import pytest
+import torch
+
+from model import CTTS
+from streaming import StreamingCTTS, STREAM_TOLERANCE
+
+INPUT_DIM = 12
+SEQ_LENGTH = 100
+
+MODELS = {
+    "full": {},
+    "local": {"attention": "local", "window": 16},
+    "shared": {"num_tickers": 3},
+}
+
+
+def make_model(kwargs):
+    torch.manual_seed(0)
+    model = CTTS(INPUT_DIM, **kwargs).eval()
+    # Non-trivial BatchNorm statistics, so the folded convolutions are exercised
+    for bn in (model.bn1, model.bn2):
+        bn.running_mean.uniform_(-0.5, 0.5)
+        bn.running_var.uniform_(0.5, 2.0)
+    return model
+
+
+@pytest.mark.parametrize("name", list(MODELS))
+@pytest.mark.parametrize("initial_rows", [SEQ_LENGTH, 10])
+def test_streaming_matches_full_forward(name, initial_rows):
+    model = make_model(MODELS[name])
+    ticker_id = 1 if model.num_tickers else None
+    ticker_ids = None if ticker_id is None else torch.tensor([ticker_id])
+    rng = np.random.default_rng(0)
+    rows = rng.random((initial_rows + 400, INPUT_DIM)).astype(np.float32)
+
+    stream = StreamingCTTS(model, SEQ_LENGTH, ticker_id)
+    end = initial_rows
+    streamed = stream.reset(rows[:end])
+    while True:
+        window = torch.from_numpy(rows[max(end - SEQ_LENGTH, 0):end]).unsqueeze(0)
+        with torch.inference_mode():
+            expected = model(window, ticker_ids)[0].numpy()
+        assert np.abs(streamed - expected).max() <= STREAM_TOLERANCE, f"after row {end}"
+
+        # Uneven batches of bars, so the window slides, grows and compacts its buffers
+        k = int(rng.integers(1, 6))
+        if end + k > len(rows):
+            break
+        streamed = stream.advance(rows[end:end + k])
+        end += k
@@ -0,0 +1,79 @@
+import json
+import struct
+from datetime import datetime, timezone
+
+import numpy as np
+
+# Binary tick frames for the /api/ws feed, negotiated per connection:
+#   client -> {"type": "hello", "formats": ["binary-v1", "json"], "batch": 1}
+#   server -> {"type": "hello", "format": "binary-v1", "columns": ["Close", ...]}
+# after which bars arrive as binary frames of up to `batch` records. The feed
+# sends one frame per replay interval, so `batch` is also the replay speed:
+# 1 keeps real time, anything larger is accelerated replay (opt-in). A server
+# that doesn't know the hello keeps sending one JSON object per bar.
+#
+# Frame layout (little-endian, packed; mirrored in frontend/server.ts):
+#   header   "TICK", uint8 version, uint8 n_columns, uint16 n_tickers, uint32 n_records
+#   tickers  n_tickers x (uint8 length, utf-8 name)
+#   records  n_records x (uint16 ticker index, int64 time in ms since the epoch, float32 x n_columns)
+
+BINARY_FORMAT = "binary-v1"
+JSON_FORMAT = "json"
+MAGIC = b"TICK"
+VERSION = 1
+HEADER = struct.Struct("<4sBBHI")
+DEFAULT_BATCH = 1  # bars per frame asked of the server; one per interval is real-time replay
+
+
+def record_dtype(n_columns):
+    return np.dtype([("ticker", "<u2"), ("time", "<i8"), ("values", "<f4", (n_columns,))])
+
+
+def hello(batch=DEFAULT_BATCH):
+    return json.dumps({"type": "hello", "formats": [BINARY_FORMAT, JSON_FORMAT], "batch": batch})
+
+
+def encode_frame(tickers, ticker_ids, times, values):
+    """
+    Pack records into one frame: `ticker_ids` index into `tickers`, `times`
+    are epoch milliseconds and `values` is a (records, columns) array.
+    """
+    values = np.asarray(values, dtype=np.float32)
+    records = np.empty(len(values), dtype=record_dtype(values.shape[1]))
+    records["ticker"], records["time"], records["values"] = ticker_ids, times, values
+
+    names = b"".join(bytes([len(name)]) + name for name in (ticker.encode("utf-8") for ticker in tickers))
+    return HEADER.pack(MAGIC, VERSION, values.shape[1], len(tickers), len(records)) + names + records.tobytes()
+
+
+def decode_frame(frame):
+    """
+    Decode a frame into [(ticker, times, values)], one entry per ticker in
+    arrival order: int64 epoch-millisecond times and a contiguous float32
+    (bars, columns) array. The records are read in place with np.frombuffer;
+    nothing is parsed per bar.
+    """
+    magic, version, n_columns, n_tickers, n_records = HEADER.unpack_from(frame, 0)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError(f"Unsupported tick frame {magic!r} v{version}")
+
+    offset, tickers = HEADER.size, []
+    for _ in range(n_tickers):
+        length = frame[offset]
+        tickers.append(bytes(frame[offset + 1:offset + 1 + length]).decode("utf-8"))
+        offset += 1 + length
+
+    records = np.frombuffer(frame, dtype=record_dtype(n_columns), count=n_records, offset=offset)
+    if n_tickers == 1:
+        return [(tickers[0], records["time"], np.ascontiguousarray(records["values"]))]
+
+    batches = []
+    ids = records["ticker"]
+    for ticker_id in dict.fromkeys(ids.tolist()):
+        selected = records[ids == ticker_id]
+        batches.append((tickers[ticker_id], selected["time"], np.ascontiguousarray(selected["values"])))
+    return batches
+
+
+def format_time(ms):
+    return datetime.fromtimestamp(ms / 1000, tz=timezone.utc).isoformat()
@@ -1,33 +1,49 @@
 import os
 import csv
-import pandas as pd
+import argparse
+import contextlib
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
 import numpy as np
 import torch
 import torch.nn as nn
 import torch.optim as optim
 from sklearn.preprocessing import MinMaxScaler
 from sklearn.model_selection import train_test_split
+from torch.utils.data import DataLoader
 from model import CTTS  # Your custom model
+from artifacts import save_artifact, SHARED_MODEL
+from feature_store import load_features
+from windowing import SequenceDataset, MultiTickerDataset, n_windows
 
 # 🛠 Hyperparameters
 SEQ_LENGTH = 120
 BATCH_SIZE = 32
 EPOCHS = 100
 LEARNING_RATE = 0.00001
+ACCUMULATION_STEPS = 1  # optimizer step every N mini-batches
+NUM_WORKERS = 2  # DataLoader prefetch workers
+USE_BF16 = False  # bf16 autocast (CPU or CUDA)
+ATTENTION = "full"  # "local" keeps attention linear in SEQ_LENGTH for long windows
+ATTENTION_WINDOW = 64  # tokens per local attention block
+TOKEN_STRIDE = 1  # extra token pooling before the transformer
+HORIZON = 1  # closes predicted per forward pass; > 1 trains a direct multi-horizon head
+VAL_SIZE = 0.4
 DATA_DIR = "data"
 MODEL_DIR = "models"
+LOG_DIR = "logs"
+TICKERS = ["RELIANCE.NS", "ITC.NS", "INFY.NS"]  # Add your tickers here
 
 # 🔹 Device
 device = torch.device("cuda:0" if torch.cuda.is_available() else "cpu")
 
 
-def load_and_prepare_data(filepath):
-    df = pd.read_csv(filepath)
-    df.drop(columns=['Date'], axis = 1,inplace=True)
-    FEATURES = df.columns.tolist()   
-    # df = df[FEATURES]
+def load_and_prepare_data(ticker, data_dir=DATA_DIR):
+    # Memory-mapped from the feature store when present, CSV otherwise
+    values, FEATURES, _ = load_features(ticker, data_dir)
     print(FEATURES)
-    return df, FEATURES
+    return values, FEATURES
 
 
 def normalize_data(df):
@@ -36,78 +52,271 @@ def normalize_data(df):
     return normalized, scaler
 
 
-def create_sequences(data, seq_length):
-    sequences, targets = [], []
-    for i in range(len(data) - seq_length):
-        sequences.append(data[i:i + seq_length])
-        targets.append(data[i + seq_length, 0])  # Predict next "Price"
-    return np.array(sequences), np.array(targets)
+def make_loader(dataset, shuffle):
+    return DataLoader(
+        dataset,
+        batch_size=BATCH_SIZE,
+        shuffle=shuffle,
+        num_workers=NUM_WORKERS,
+        pin_memory=device.type == "cuda",
+        persistent_workers=NUM_WORKERS > 0,
+        prefetch_factor=2 if NUM_WORKERS > 0 else None,
+    )
 
 
-def prepare_tensors(X, y):
-    X_tensor = torch.tensor(X, dtype=torch.float32).to(device)
-    y_tensor = torch.tensor(y, dtype=torch.float32).unsqueeze(1).to(device)
+def evaluate_loss(model, loader, criterion):
+    model.eval()
+    total = torch.zeros((), device=device)
+    with torch.no_grad(), torch.autocast(device_type=device.type, dtype=torch.bfloat16, enabled=USE_BF16):
+        for X, y, *ticker_ids in loader:
+            X, y = X.to(device, non_blocking=True), y.to(device, non_blocking=True)
+            ticker_ids = [ids.to(device, non_blocking=True) for ids in ticker_ids]
+            total += criterion(model(X, *ticker_ids).float(), y) * len(X)
+    return total.item() / max(len(loader.dataset), 1)
 
-    if torch.isnan(X_tensor).any() or torch.isnan(y_tensor).any():
-        raise ValueError("ERROR: Training data contains NaN values!")
 
-    return X_tensor, y_tensor
-
-
-def train_model(model, X_train, y_train, criterion, optimizer, epochs, ticker):
+def train_model(model, train_loader, val_loader, criterion, optimizer, epochs, ticker):
     for epoch in range(epochs):
         model.train()
         optimizer.zero_grad()
-        predictions = model(X_train)
+        running_loss = torch.zeros((), device=device)
+
+        # Batches from MultiTickerDataset also carry ticker ids
+        for step, (X, y, *ticker_ids) in enumerate(train_loader):
+            X, y = X.to(device, non_blocking=True), y.to(device, non_blocking=True)
+            ticker_ids = [ids.to(device, non_blocking=True) for ids in ticker_ids]
+
+            with torch.autocast(device_type=device.type, dtype=torch.bfloat16, enabled=USE_BF16):
+                predictions = model(X, *ticker_ids)
+            loss = criterion(predictions.float(), y)
+
+            (loss / ACCUMULATION_STEPS).backward()
+            if (step + 1) % ACCUMULATION_STEPS == 0 or step + 1 == len(train_loader):
+                optimizer.step()
+                optimizer.zero_grad()
 
-        if torch.isnan(predictions).any():
-            raise ValueError(f"ERROR: Model output contains NaN values for {ticker}!")
+            # Accumulated on the device; synced to the host once per epoch
+            running_loss += loss.detach() * len(X)
 
-        loss = criterion(predictions, y_train)
-        if torch.isnan(loss):
+        train_loss = running_loss.item() / len(train_loader.dataset)
+        if np.isnan(train_loss):
             raise ValueError(f"ERROR: Loss is NaN for {ticker}! Check dataset or reduce learning rate.")
 
-        loss.backward()
-        optimizer.step()
-        print(f"[{ticker}] Epoch {epoch + 1}/{epochs}, Loss: {loss.item():.6f}")
+        val_loss = evaluate_loss(model, val_loader, criterion)
+        print(f"[{ticker}] Epoch {epoch + 1}/{epochs}, Loss: {train_loss:.6f}, Val Loss: {val_loss:.6f}")
 
     return model
 
 
-def save_model(model, ticker, path_dir=MODEL_DIR):
+def save_model(model, ticker, scaler, features, n_rows, path_dir=MODEL_DIR, horizon=HORIZON):
     os.makedirs(path_dir, exist_ok=True)
     path = os.path.join(path_dir, f"model_{ticker}.pth")
-    torch.save(model.state_dict(), path)
+    # Weights plus everything needed to reproduce predictions; see artifacts.py
+    training = {
+        "epochs": EPOCHS,
+        "batch_size": BATCH_SIZE,
+        "learning_rate": LEARNING_RATE,
+        "accumulation_steps": ACCUMULATION_STEPS,
+        "val_size": VAL_SIZE,
+        "horizon": horizon,
+        "rows": n_rows,
+    }
+    save_artifact(path, model, scaler, features, SEQ_LENGTH, training, ticker)
     print(f"✅ Model for {ticker} saved to {path}")
 
 
-def train_for_ticker(ticker):
+def train_for_ticker(ticker, horizon=HORIZON):
     print(f"\n🚀 Training model for: {ticker}")
-    filepath = os.path.join(DATA_DIR, f"Data_{ticker}.csv")
 
     try:
-        df, features = load_and_prepare_data(filepath)
-        data, scaler = normalize_data(df)
-        X_np, y_np = create_sequences(data, SEQ_LENGTH)
-        X_tensor, y_tensor = prepare_tensors(X_np, y_np)
-        X_train, _, y_train, _ = train_test_split(X_tensor, y_tensor, test_size=0.4, random_state=42, shuffle=True)
+        values, features = load_and_prepare_data(ticker)
+        data, scaler = normalize_data(values)
+        if np.isnan(data).any():
+            raise ValueError("ERROR: Training data contains NaN values!")
 
-        model = CTTS(input_dim=len(features)).to(device)
+        # Windows are sliced lazily per batch; only the scaled rows stay in memory
+        windows = n_windows(len(data), SEQ_LENGTH, horizon)
+        train_idx, val_idx = train_test_split(np.arange(windows), test_size=VAL_SIZE, random_state=42, shuffle=True)
+        train_loader = make_loader(SequenceDataset(data, SEQ_LENGTH, train_idx, horizon), shuffle=True)
+        val_loader = make_loader(SequenceDataset(data, SEQ_LENGTH, val_idx, horizon), shuffle=False)
+
+        model = CTTS(input_dim=len(features), output_dim=horizon, attention=ATTENTION, window=ATTENTION_WINDOW,
+                     token_stride=TOKEN_STRIDE).to(device)
         criterion = nn.MSELoss()
         optimizer = optim.Adam(model.parameters(), lr=LEARNING_RATE)
 
-        trained_model = train_model(model, X_train, y_train, criterion, optimizer, EPOCHS, ticker)
-        save_model(trained_model, ticker)
+        trained_model = train_model(model, train_loader, val_loader, criterion, optimizer, EPOCHS, ticker)
+        save_model(trained_model, ticker, scaler, features, len(data), horizon=horizon)
+        return True
 
     except Exception as e:
         print(f"❌ Failed to train model for {ticker}: {e}")
+        return False
+
+
+def train_shared(tickers, path_dir=MODEL_DIR, horizon=HORIZON):
+    """
+    Train one CTTS for all tickers, with a learned ticker embedding and
+    batches that mix windows from every ticker. Each ticker keeps its own
+    scaler; all are saved in the models/model_shared.pth artifact.
+    """
+    print(f"\n🚀 Training shared model for {len(tickers)} tickers")
+
+    scalers, train_sets, val_sets, features, rows = {}, [], [], None, 0
+    for ticker in tickers:
+        try:
+            values, ticker_features = load_and_prepare_data(ticker)
+            if features is None:
+                features = ticker_features
+            elif ticker_features != features:
+                values = np.asarray(values)[:, [ticker_features.index(name) for name in features]]
+            data, scaler = normalize_data(values)
+            if np.isnan(data).any():
+                raise ValueError("ERROR: Training data contains NaN values!")
+        except Exception as e:
+            print(f"❌ Skipping {ticker}: {e}")
+            continue
+
+        windows = n_windows(len(data), SEQ_LENGTH, horizon)
+        if windows < 2:
+            print(f"❌ Skipping {ticker}: not enough rows for a {SEQ_LENGTH}-row window")
+            continue
+        train_idx, val_idx = train_test_split(np.arange(windows), test_size=VAL_SIZE, random_state=42, shuffle=True)
+        ticker_id = len(scalers)
+        train_sets.append((data, train_idx, ticker_id))
+        val_sets.append((data, val_idx, ticker_id))
+        scalers[ticker] = scaler
+        rows += len(data)
+
+    if not scalers:
+        print("❌ No ticker could be loaded for the shared model")
+        return False
+
+    train_loader = make_loader(MultiTickerDataset(train_sets, SEQ_LENGTH, horizon), shuffle=True)
+    val_loader = make_loader(MultiTickerDataset(val_sets, SEQ_LENGTH, horizon), shuffle=False)
+
+    model = CTTS(input_dim=len(features), output_dim=horizon, attention=ATTENTION, window=ATTENTION_WINDOW,
+                 token_stride=TOKEN_STRIDE, num_tickers=len(scalers)).to(device)
+    criterion = nn.MSELoss()
+    optimizer = optim.Adam(model.parameters(), lr=LEARNING_RATE)
+    trained_model = train_model(model, train_loader, val_loader, criterion, optimizer, EPOCHS, "shared")
+
+    os.makedirs(path_dir, exist_ok=True)
+    path = os.path.join(path_dir, SHARED_MODEL)
+    training = {
+        "epochs": EPOCHS,
+        "batch_size": BATCH_SIZE,
+        "learning_rate": LEARNING_RATE,
+        "accumulation_steps": ACCUMULATION_STEPS,
+        "val_size": VAL_SIZE,
+        "horizon": horizon,
+        "rows": rows,
+    }
+    save_artifact(path, trained_model, None, features, SEQ_LENGTH, training, scalers=scalers)
+    print(f"✅ Shared model for {len(scalers)} tickers saved to {path}")
+    return True
+
+
+def load_universe(path):
+    """
+    Read one ticker per line, skipping blank lines and # comments.
+    """
+    with open(path, encoding="utf-8") as f:
+        return [line.strip() for line in f if line.strip() and not line.lstrip().startswith("#")]
+
+
+def init_worker(num_threads):
+    global NUM_WORKERS
+    # Each process gets its own slice of the cores; no nested DataLoader workers
+    torch.set_num_threads(num_threads)
+    NUM_WORKERS = 0
+
+
+def train_isolated(ticker, horizon=HORIZON):
+    """
+    Train one ticker in a pool worker with its output captured in logs/train_{ticker}.log.
+    """
+    os.makedirs(LOG_DIR, exist_ok=True)
+    log_path = os.path.join(LOG_DIR, f"train_{ticker}.log")
+    with open(log_path, "w", encoding="utf-8") as log, contextlib.redirect_stdout(log), contextlib.redirect_stderr(log):
+        ok = train_for_ticker(ticker, horizon)
+    return ok, log_path
+
+
+def run_pool(tickers, workers, num_threads, horizon, results):
+    """
+    Train `tickers` on one process pool, recording each outcome in `results`.
+    Returns the tickers left unfinished because a worker died (segfault, OOM
+    kill): that breaks the whole pool, so every pending ticker fails with it.
+    """
+    # spawn keeps CUDA and OpenMP state from leaking into the workers
+    context = multiprocessing.get_context("spawn")
+    unfinished = []
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context, initializer=init_worker, initargs=(num_threads,)) as pool:
+        futures = {pool.submit(train_isolated, ticker, horizon): ticker for ticker in tickers}
+        for future in as_completed(futures):
+            ticker = futures[future]
+            try:
+                ok, log_path = future.result()
+            except BrokenProcessPool:
+                unfinished.append(ticker)
+                continue
+            except Exception as e:
+                ok, log_path = False, None
+                print(f"❌ Worker crashed while training {ticker}: {e}")
+            results[ticker] = ok
+            print(f"{'✅' if ok else '❌'} {ticker} (log: {log_path})")
+    return unfinished
+
+
+def train_parallel(tickers, workers, horizon=HORIZON):
+    """
+    Train each ticker in its own process, splitting torch threads across the pool.
+
+    If a worker process dies, the unfinished tickers are retried on a new pool;
+    if that one dies too, they are retried one per pool, so only the ticker
+    that kills its worker is reported as failed.
+    """
+    num_threads = max(1, (os.cpu_count() or 1) // workers)
+    print(f"🚀 Training {len(tickers)} tickers on {workers} workers ({num_threads} threads each)")
+
+    results = {}
+    unfinished = run_pool(tickers, workers, num_threads, horizon, results)
+    if unfinished:
+        print(f"⚠️ A worker died; retrying {len(unfinished)} unfinished tickers on a new pool")
+        unfinished = run_pool(unfinished, workers, num_threads, horizon, results)
+
+    for ticker in unfinished:
+        if run_pool([ticker], 1, num_threads, horizon, results):
+            results[ticker] = False
+            print(f"❌ Worker died while training {ticker}")
+
+    return results
 
 
 def main():
-    tickers = ["RELIANCE.NS", "ITC.NS", "INFY.NS"]  # Add your tickers here
+    parser = argparse.ArgumentParser(description="Train one CTTS model per ticker.")
+    parser.add_argument("--tickers", nargs="+", help="Tickers to train (default: built-in list)")
+    parser.add_argument("--universe", help="File with one ticker per line")
+    parser.add_argument("--workers", type=int, default=1, help="Train this many tickers in parallel processes")
+    parser.add_argument("--shared", action="store_true", help="Train one model for all tickers (model_shared.pth)")
+    parser.add_argument("--horizon", type=int, default=HORIZON, help="Closes predicted per forward pass (direct multi-horizon head)")
+    args = parser.parse_args()
+
+    tickers = args.tickers or (load_universe(args.universe) if args.universe else TICKERS)
+
+    if args.shared:
+        train_shared(tickers, horizon=args.horizon)
+        return
+
+    if args.workers > 1:
+        results = train_parallel(tickers, args.workers, args.horizon)
+        failed = [ticker for ticker, ok in results.items() if not ok]
+        print(f"\nTrained {len(tickers) - len(failed)}/{len(tickers)} tickers" + (f", failed: {', '.join(failed)}" if failed else ""))
+        return
 
     for ticker in tickers:
-        train_for_ticker(ticker)
+        train_for_ticker(ticker, args.horizon)
 
 
 if __name__ == "__main__":
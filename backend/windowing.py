@@ -0,0 +1,86 @@
+import numpy as np
+import torch
+from numpy.lib.stride_tricks import sliding_window_view
+from torch.utils.data import Dataset
+
+
+def n_windows(n_rows, seq_length, horizon=1):
+    # Windows with `horizon` target rows after them
+    return max(n_rows - seq_length - horizon + 1, 0)
+
+
+def create_sequences(data, seq_length, horizon=1):
+    """
+    Split scaled data into (window, next target) pairs without copying.
+
+    Returns a read-only strided view of shape (N - seq_length - horizon + 1,
+    seq_length, features) over `data`, and the matching targets from column 0
+    ("Close"): shape (windows,) for horizon 1, else (windows, horizon) with
+    the next `horizon` closes after each window.
+    """
+    n = n_windows(len(data), seq_length, horizon)
+    if n == 0:
+        empty_y = (0,) if horizon == 1 else (0, horizon)
+        return np.empty((0, seq_length, data.shape[1]), dtype=data.dtype), np.empty(empty_y, dtype=data.dtype)
+
+    # sliding_window_view puts the window axis last: (N - seq_length + 1, features, seq_length)
+    windows = sliding_window_view(data, seq_length, axis=0)[:n]
+    X = windows.transpose(0, 2, 1)
+    if horizon == 1:
+        return X, data[seq_length:, 0]
+    y = sliding_window_view(data[seq_length:, 0], horizon)
+    return X, y
+
+
+class SequenceDataset(Dataset):
+    """
+    Lazily sliced training windows over a single (N, features) array.
+
+    Only the underlying rows are held in memory; each item is a
+    (seq_length, features) window and the next `horizon` targets, shape
+    (horizon,). `indices` restricts the dataset to a subset of window start
+    positions, e.g. a train/test split.
+    """
+
+    def __init__(self, data, seq_length, indices=None, horizon=1):
+        self.data = torch.as_tensor(np.ascontiguousarray(data, dtype=np.float32))
+        self.seq_length = seq_length
+        self.horizon = horizon
+        if indices is None:
+            indices = np.arange(n_windows(len(data), seq_length, horizon))
+        self.indices = np.asarray(indices)
+
+    def __len__(self):
+        return len(self.indices)
+
+    def __getitem__(self, i):
+        start = int(self.indices[i])
+        end = start + self.seq_length
+        return self.data[start:end], self.data[end:end + self.horizon, 0]
+
+
+class MultiTickerDataset(Dataset):
+    """
+    Windows from several tickers behind one index, for a shared model.
+
+    `datasets` is a list of (data, indices, ticker_id) with each ticker's own
+    scaled rows; items are (window, target, ticker_id), so a shuffled loader
+    mixes tickers within every batch.
+    """
+
+    def __init__(self, datasets, seq_length, horizon=1):
+        self.seq_length = seq_length
+        self.horizon = horizon
+        self.data = [torch.as_tensor(np.ascontiguousarray(data, dtype=np.float32)) for data, _, _ in datasets]
+        self.ticker_ids = [ticker_id for _, _, ticker_id in datasets]
+        self.sources = np.concatenate([np.full(len(indices), k) for k, (_, indices, _) in enumerate(datasets)] or [np.empty(0, dtype=np.int64)])
+        self.starts = np.concatenate([np.asarray(indices) for _, indices, _ in datasets] or [np.empty(0, dtype=np.int64)])
+
+    def __len__(self):
+        return len(self.starts)
+
+    def __getitem__(self, i):
+        k, start = int(self.sources[i]), int(self.starts[i])
+        end = start + self.seq_length
+        data = self.data[k]
+        return data[start:end], data[end:end + self.horizon, 0], self.ticker_ids[k]
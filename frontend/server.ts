@@ -13,12 +13,57 @@ const clients: Set<WebSocket> = new Set();
 
 // Path to the dataset
 const datasetPath = path.join(process.cwd(), "dataset", "Data_INFY.NS.csv");
+const datasetTicker = "INFY.NS";
+const headers = ["Datetime", "Close", "High", "Low", "Open", "Volume", "SMA_10", "EMA_10", "ROC", "RSI"];
+
+// Binary tick frames, negotiated by a {"type": "hello"} message from the client.
+// Layout (little-endian, packed; decoded by backend/tick_protocol.py):
+//   header   "TICK", uint8 version, uint8 n_columns, uint16 n_tickers, uint32 n_records
+//   tickers  n_tickers x (uint8 length, utf-8 name)
+//   records  n_records x (uint16 ticker index, int64 time in ms since the epoch, float32 x n_columns)
+const BINARY_FORMAT = "binary-v1";
+const FRAME_VERSION = 1;
+const MAX_BATCH = 4096;
+const frameColumns = headers.slice(1);
+
+type Bar = { ticker: string; row: Record<string, string> };
+
+function encodeFrame(bars: Bar[]): Buffer {
+	const tickers = [...new Set(bars.map((bar) => bar.ticker))];
+	const names = tickers.map((ticker) => Buffer.from(ticker, "utf-8"));
+	const recordSize = 2 + 8 + 4 * frameColumns.length;
+	const namesSize = names.reduce((size, name) => size + 1 + name.length, 0);
+	const frame = Buffer.alloc(12 + namesSize + recordSize * bars.length);
+
+	frame.write("TICK", 0, "ascii");
+	frame.writeUInt8(FRAME_VERSION, 4);
+	frame.writeUInt8(frameColumns.length, 5);
+	frame.writeUInt16LE(tickers.length, 6);
+	frame.writeUInt32LE(bars.length, 8);
+
+	let offset = 12;
+	for (const name of names) {
+		frame.writeUInt8(name.length, offset);
+		name.copy(frame, offset + 1);
+		offset += 1 + name.length;
+	}
+	for (const { ticker, row } of bars) {
+		const time = Date.parse(row.Datetime);
+		frame.writeUInt16LE(tickers.indexOf(ticker), offset);
+		frame.writeBigInt64LE(BigInt(Number.isNaN(time) ? 0 : time), offset + 2);
+		offset += 10;
+		for (const column of frameColumns) {
+			frame.writeFloatLE(Number.parseFloat(row[column]), offset); // NaN when missing
+			offset += 4;
+		}
+	}
+	return frame;
+}
 
 // Function to parse the CSV file into an array of objects
 function parseCSV(filePath: string) {
 	const data = fs.readFileSync(filePath, "utf-8");
 	const rows = data.split("\n").slice(3); // Skip the first 3 header rows
-	const headers = ["Datetime", "Close", "High", "Low", "Open", "Volume", "SMA_10", "EMA_10", "ROC", "RSI"];
 
 	return rows.map((row) => {
 		const values = row.split(",");
@@ -46,10 +91,21 @@ nextApp.prepare().then(() => {
 		clients.add(ws);
 		console.log("New Client Connected");
 
+		// JSON, one row per message, unless the client negotiates binary frames
+		let binary = false;
+		let batchSize = 1;
+
 		// Send stock data row by row at 1-minute intervals
 		let index = 0;
 		const interval = setInterval(() => {
 			if (index < stockData.length) {
+				if (binary) {
+					// Up to batchSize rows per frame: 1 replays in real time, more is accelerated replay
+					const rows = stockData.slice(index, index + batchSize);
+					ws.send(encodeFrame(rows.map((row) => ({ ticker: datasetTicker, row }))));
+					index += rows.length;
+					return;
+				}
 				const row = stockData[index];
 				ws.send(JSON.stringify(row)); // Send the current row as JSON
 				// console.log(`Sent row ${index + 1}:`, row);
@@ -61,6 +117,12 @@ nextApp.prepare().then(() => {
 		}, 1000); // 1 minute interval (60000 ms)
 		ws.on("message", (message) => {
 			const parsed = JSON.parse(message.toString());
+			if (parsed.type === "hello") {
+				binary = Array.isArray(parsed.formats) && parsed.formats.includes(BINARY_FORMAT);
+				batchSize = Math.min(Math.max(Number(parsed.batch) || 1, 1), MAX_BATCH);
+				ws.send(JSON.stringify({ type: "hello", format: binary ? BINARY_FORMAT : "json", columns: frameColumns }));
+				return;
+			}
 			if (parsed.type === "log") {
 				console.log("📋 Client Log:", parsed.content);
 			}